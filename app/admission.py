@@ -0,0 +1,224 @@
+"""
+Admission control and load shedding.
+
+AdmissionControlMiddleware sits in front of every route and:
+
+- caps the number of requests being processed at once, so requests do not
+  pile up behind the threadpool and the database connection pool;
+- lets a bounded number of requests wait for a slot, and answers 503 with
+  Retry-After immediately when the queue is full or when the estimated wait
+  already exceeds the wait deadline (ADMISSION_MAX_WAIT);
+- optionally applies a per-client token-bucket rate limit, with separate
+  budgets for cheap and heavy routes (429 with Retry-After).
+
+Settings are read from environment variables; see AdmissionSettings.from_env.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+CHEAP = "cheap"
+HEAVY = "heavy"
+
+# Routes that read a whole result set of snippets; everything else is cheap
+HEAVY_PREFIXES = ("/api/snippets", "/api/matrix")
+
+# Never queued or rate limited
+EXEMPT_PATHS = {"/", "/healthz", "/readyz", "/docs", "/redoc", "/openapi.json"}
+
+# Rate limited but never queued. Event streams stay open and would hold a
+# slot all along, while only reading the database from one shared task.
+UNQUEUED_PATHS = {"/api/changes/stream"}
+
+# Maximum number of clients tracked by the rate limiter
+MAX_TRACKED_CLIENTS = 10_000
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass
+class AdmissionSettings:
+    max_concurrency: int = 15  # Matches the default database pool size plus overflow
+    max_queue: int = 50
+    max_wait: float = 2.0  # Seconds a request may wait for a slot
+    rate_limits: dict[str, tuple[float, float]] = field(default_factory=dict)  # class -> (per second, burst)
+    trust_forwarded: bool = False
+
+    def __post_init__(self):
+        for route_class, (rate, burst) in self.rate_limits.items():
+            if not rate > 0 or not burst >= 1:
+                raise ValueError(
+                    f"Rate limit for {route_class} routes needs a rate above 0 and a burst of at least 1, "
+                    f"got {rate}/{burst}"
+                )
+
+    @classmethod
+    def from_env(cls) -> "AdmissionSettings":
+        """
+        Read settings from the environment:
+
+        ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT,
+        RATE_LIMIT_CHEAP / RATE_LIMIT_HEAVY ("<requests per second>/<burst>",
+        unset disables the limit) and RATE_LIMIT_TRUST_FORWARDED.
+        Raises ValueError for a rate limit that is malformed or would never
+        admit a request.
+        """
+        defaults = cls()
+        rate_limits = {}
+        for route_class in (CHEAP, HEAVY):
+            name = f"RATE_LIMIT_{route_class.upper()}"
+            value = os.getenv(name)
+            if value:
+                rate, _, burst = value.partition("/")
+                try:
+                    rate_limits[route_class] = (float(rate), float(burst or rate))
+                except ValueError:
+                    raise ValueError(f"{name} must be <requests per second>/<burst>, got {value!r}") from None
+        return cls(
+            max_concurrency=int(_env_float("ADMISSION_MAX_CONCURRENCY", defaults.max_concurrency)),
+            max_queue=int(_env_float("ADMISSION_MAX_QUEUE", defaults.max_queue)),
+            max_wait=_env_float("ADMISSION_MAX_WAIT", defaults.max_wait),
+            rate_limits=rate_limits,
+            trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED", "").lower() in ("1", "true", "yes"),
+        )
+
+
+class ConcurrencyLimiter:
+    """Bounded concurrency with a bounded wait queue and wait-time estimation."""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        # Exponentially weighted average of request service time, in seconds
+        self.service_time = 0.05
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def estimated_wait(self) -> float:
+        """Expected seconds before a newly queued request gets a slot."""
+        if self.active < self.max_concurrency:
+            return 0.0
+        return (self.waiting + 1) * self.service_time / self.max_concurrency
+
+    async def acquire(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for a slot. Returns False if the request should be shed."""
+        if self.active >= self.max_concurrency:
+            if self.waiting >= self.max_queue or self.estimated_wait() > timeout:
+                return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self, elapsed: float) -> None:
+        self.active -= 1
+        self.service_time = 0.9 * self.service_time + 0.1 * elapsed
+        self._semaphore.release()
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets, keyed by (client, route class)."""
+
+    def __init__(self, rate_limits: dict[str, tuple[float, float]]):
+        self.rate_limits = rate_limits
+        self._buckets: OrderedDict[tuple[str, str], tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str, route_class: str) -> float:
+        """
+        Take one token from the client's bucket.
+        Returns 0 if the request is allowed, otherwise seconds until a token is available.
+        """
+        limit = self.rate_limits.get(route_class)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        key = (client, route_class)
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def route_class(path: str) -> str:
+    return HEAVY if path.startswith(HEAVY_PREFIXES) else CHEAP
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying the concurrency limiter and the rate limiter."""
+
+    def __init__(self, app: ASGIApp, settings: AdmissionSettings | None = None):
+        self.app = app
+        self.settings = settings or AdmissionSettings.from_env()
+        self.limiter = ConcurrencyLimiter(self.settings.max_concurrency, self.settings.max_queue)
+        self.rate_limiter = TokenBucketLimiter(self.settings.rate_limits)
+
+    def client_id(self, scope: Scope) -> str:
+        if self.settings.trust_forwarded:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self.rate_limiter.take(self.client_id(scope), route_class(scope["path"]))
+        if retry_after:
+            response = JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+
+        if scope["path"] in UNQUEUED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.limiter.acquire(self.settings.max_wait):
+            retry_after = max(1, math.ceil(self.limiter.estimated_wait()))
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.monotonic() - started)
@@ -0,0 +1,51 @@
+"""
+Content-addressed storage for snippet code and explanations.
+
+Snippets reference a Blob by their content_hash, so identical content is
+stored once however many snippets use it, and a sync only writes the blobs
+it has not seen before. New code is compressed with the current dictionary,
+if any (see app/compression.py).
+"""
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import compression, models
+
+
+def ensure_blob(db: Session, content_hash: str, code: str, explanation: str | None) -> tuple[models.Blob, bool]:
+    """
+    Return the blob for content_hash, adding it if it does not exist yet.
+    Returns (blob, created).
+    """
+    # Blobs added earlier in this session are not visible to db.get() until flushed
+    known = db.info.setdefault("blobs", {})
+    blob = known.get(content_hash) or db.get(models.Blob, content_hash)
+    created = blob is None
+    if created:
+        blob = models.Blob(hash=content_hash, explanation=explanation)
+        compression.store_code(blob, code, compression.current_dictionary(db))
+        db.add(blob)
+    known[content_hash] = blob
+    return blob, created
+
+
+def delete_orphan_blobs(db: Session) -> int:
+    """Delete blobs no snippet references any more. Returns the number deleted."""
+    db.flush()
+    db.info.pop("blobs", None)
+    result = db.execute(
+        delete(models.Blob).where(
+            models.Blob.hash.not_in(select(models.Snippet.content_hash).distinct())
+        )
+    )
+    return result.rowcount
+
+
+def shared_blobs(snippets) -> dict[str, dict]:
+    """Map each distinct content_hash in snippets to its code and explanation."""
+    blobs = {}
+    for snippet in snippets:
+        if snippet is not None and snippet.content_hash not in blobs:
+            blobs[snippet.content_hash] = {"code": snippet.code, "explanation": snippet.explanation}
+    return blobs
@@ -0,0 +1,75 @@
+"""
+Catalog generation tracking.
+
+The catalog only changes when seed_data or sync_snippets runs, so those
+scripts bump a generation counter in the catalog_state table whenever they
+commit changes. API processes read the counter to decide whether anything
+derived from the catalog (response caches, in-memory indexes) is still valid.
+"""
+
+import threading
+from typing import Callable, Hashable, TypeVar
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+T = TypeVar("T")
+
+STATE_ID = 1
+
+
+def get_generation(db: Session) -> int:
+    """Current catalog generation (0 for a catalog that was never seeded or synced)."""
+    if not isinstance(db, Session):
+        # File storage backend
+        return db.generation
+    generation = (
+        db.query(models.CatalogState.generation)
+        .filter(models.CatalogState.id == STATE_ID)
+        .scalar()
+    )
+    return generation or 0
+
+
+def bump_generation(db: Session) -> int:
+    """Advance the catalog generation. Does not commit. Returns the new generation."""
+    state = db.get(models.CatalogState, STATE_ID)
+    if state is None:
+        state = models.CatalogState(id=STATE_ID, generation=0)
+        db.add(state)
+    state.generation += 1
+    db.flush()
+    return state.generation
+
+
+class GenerationCache:
+    """Thread-safe cache whose entries are dropped as soon as the generation changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = {}
+
+    def get_or_build(self, generation: int, key: Hashable, builder: Callable[[], T]) -> T:
+        """Return the cached value for key, building it if missing or stale."""
+        with self._lock:
+            # Any change invalidates, including a lower generation: a catalog
+            # restored from a backup or rebuilt from scratch starts lower
+            if generation != self._generation:
+                self._generation = generation
+                self._entries = {}
+            elif key in self._entries:
+                return self._entries[key]
+
+        value = builder()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation = None
+            self._entries = {}
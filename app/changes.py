@@ -0,0 +1,193 @@
+"""
+Catalog change log.
+
+seed_data and sync_snippets record what they added, updated or deleted in
+the changes table, under a sequence number that only ever grows. Mirrors
+keep the highest seq they have applied and ask /api/changes for everything
+after it, instead of downloading the whole catalog again.
+
+The log is compacted as it is written: it holds one row per catalog key
+(a snippet's operation/language/method, an operation or a language slug),
+for its latest change, so a key changed many times costs one row. Deletes
+are kept as tombstones until they are TOMBSTONE_GENERATIONS generations
+old; dropping them raises the log's floor, and a mirror whose position is
+below the floor may have missed a delete and has to refetch everything.
+
+    python -m app.changes                      # log size and floor
+    python -m app.changes --compact --keep 10  # expire tombstones now
+"""
+
+import argparse
+from contextlib import contextmanager
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .catalog import STATE_ID
+
+SNIPPET = "snippet"
+OPERATION = "operation"
+LANGUAGE = "language"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Generations a tombstone is kept for
+TOMBSTONE_GENERATIONS = 100
+
+
+def snippet_key(operation: str, language: str, method: str) -> str:
+    return f"{SNIPPET}/{operation}/{language}/{method}"
+
+
+class ChangeSet:
+    """
+    Changes made by one seed or sync, recorded against the generation it
+    commits. Upserts keep the changed object and read its id and content
+    when applied, after the session has been flushed.
+    """
+
+    def __init__(self):
+        # key -> (kind, action, object, operation slug, language slug, method)
+        self.entries = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def upsert_language(self, language: models.Language) -> None:
+        self.entries[f"{LANGUAGE}/{language.slug}"] = (LANGUAGE, UPSERT, language, None, language.slug, None)
+
+    def upsert_operation(self, operation: models.Operation) -> None:
+        self.entries[f"{OPERATION}/{operation.slug}"] = (OPERATION, UPSERT, operation, operation.slug, None, None)
+
+    def upsert_snippet(self, snippet: models.Snippet, operation: str, language: str) -> None:
+        self.entries[snippet_key(operation, language, snippet.method)] = (
+            SNIPPET, UPSERT, snippet, operation, language, snippet.method
+        )
+
+    def delete_language(self, language: str) -> None:
+        self.entries[f"{LANGUAGE}/{language}"] = (LANGUAGE, DELETE, None, None, language, None)
+
+    def delete_operation(self, operation: str) -> None:
+        self.entries[f"{OPERATION}/{operation}"] = (OPERATION, DELETE, None, operation, None, None)
+
+    def delete_snippet(self, operation: str, language: str, method: str) -> None:
+        self.entries[snippet_key(operation, language, method)] = (SNIPPET, DELETE, None, operation, language, method)
+
+    def apply(self, db: Session, generation: int) -> int:
+        """Write the changes, replacing older entries for the same keys. Does not commit."""
+        if not self.entries:
+            return 0
+        db.flush()
+        keys = list(self.entries)
+        for start in range(0, len(keys), 500):
+            db.execute(delete(models.Change).where(models.Change.key.in_(keys[start:start + 500])))
+        db.execute(insert(models.Change), [
+            {
+                "key": key,
+                "generation": generation,
+                "kind": kind,
+                "action": action,
+                "item_id": item.id if item is not None else None,
+                "operation": operation,
+                "language": language,
+                "method": method,
+                "content_hash": item.content_hash if kind == SNIPPET and item is not None else None,
+            }
+            for key, (kind, action, item, operation, language, method) in self.entries.items()
+        ])
+        return len(keys)
+
+
+def catalog_keys(db: Session) -> dict[str, tuple]:
+    """Every key currently in the catalog, mapped to the ChangeSet.delete_* arguments for it."""
+    keys = {}
+    for (slug,) in db.query(models.Language.slug):
+        keys[f"{LANGUAGE}/{slug}"] = (LANGUAGE, slug)
+    for (slug,) in db.query(models.Operation.slug):
+        keys[f"{OPERATION}/{slug}"] = (OPERATION, slug)
+    rows = (
+        db.query(models.Operation.slug, models.Language.slug, models.Snippet.method)
+        .select_from(models.Snippet)
+        .join(models.Operation)
+        .join(models.Language)
+    )
+    for operation, language, method in rows:
+        keys[snippet_key(operation, language, method)] = (SNIPPET, operation, language, method)
+    return keys
+
+
+def delete_missing(changes: ChangeSet, previous: dict[str, tuple], current: dict[str, tuple]) -> None:
+    """Record tombstones for keys in previous (from catalog_keys) that are not in current."""
+    for key, (kind, *args) in previous.items():
+        if key in current:
+            continue
+        if kind == SNIPPET:
+            changes.delete_snippet(*args)
+        elif kind == OPERATION:
+            changes.delete_operation(*args)
+        else:
+            changes.delete_language(*args)
+
+
+def get_floor(db: Session) -> int:
+    """Lowest position a mirror can catch up from."""
+    floor = db.query(models.CatalogState.changes_floor).filter(models.CatalogState.id == STATE_ID).scalar()
+    return floor or 0
+
+
+def latest_seq(db: Session) -> int:
+    return db.query(func.max(models.Change.seq)).scalar() or 0
+
+
+def compact(db: Session, generation: int, keep_generations: int = TOMBSTONE_GENERATIONS) -> int:
+    """
+    Drop tombstones recorded more than keep_generations generations before
+    generation, raising the floor past them. Does not commit. Returns the
+    number dropped.
+    """
+    expired = models.Change.generation <= generation - keep_generations
+    tombstones = db.query(models.Change.seq).filter(models.Change.action == DELETE, expired)
+    highest = tombstones.order_by(models.Change.seq.desc()).limit(1).scalar()
+    if highest is None:
+        return 0
+
+    state = db.get(models.CatalogState, STATE_ID)
+    if state is None:
+        state = models.CatalogState(id=STATE_ID, generation=0)
+        db.add(state)
+    state.changes_floor = max(state.changes_floor or 0, highest)
+    result = db.execute(delete(models.Change).where(models.Change.action == DELETE, expired))
+    return result.rowcount
+
+
+def main():
+    from .catalog import get_generation
+    from .database import get_db
+    from .schema import init_schema
+
+    parser = argparse.ArgumentParser(description="Inspect or compact the catalog change log")
+    parser.add_argument("--compact", action="store_true", help="Expire old tombstones")
+    parser.add_argument(
+        "--keep", type=int, default=TOMBSTONE_GENERATIONS, help="Generations to keep tombstones for"
+    )
+    args = parser.parse_args()
+
+    init_schema()
+    with contextmanager(get_db)() as db:
+        if args.compact:
+            dropped = compact(db, get_generation(db), args.keep)
+            db.commit()
+            print(f"Dropped {dropped} tombstones")
+        entries = db.query(models.Change.action, func.count()).group_by(models.Change.action).all()
+        counts = dict(entries)
+        floor = get_floor(db)
+        print(
+            f"Change log: {counts.get(UPSERT, 0)} upserts, {counts.get(DELETE, 0)} tombstones, "
+            f"seq {floor}..{max(latest_seq(db), floor)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Dictionary compression of snippet code.
+
+Snippets are short and share most of their text (keywords, imports, common
+idioms), so compressing each one on its own gains little. Code is instead
+compressed with raw DEFLATE primed with a preset dictionary trained on the
+whole corpus. Dictionaries are content-addressed and never change; each blob
+records the dictionary it was compressed with.
+
+    python -m app.compression train    # train a dictionary and recompress all code
+    python -m app.compression stats    # show how code is stored
+    python -m app.compression off      # store all code uncompressed again
+
+Once a dictionary exists, seed_data --compress and sync_snippets compress
+newly written code with it. Code is only decompressed when it is read, and
+/api/blobs/{content_hash}/code hands the stored bytes to clients that accept
+the x-zdict content encoding without decompressing them.
+"""
+
+import argparse
+import hashlib
+import zlib
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Content-Encoding of raw DEFLATE data primed with a preset dictionary
+CONTENT_ENCODING = "x-zdict"
+
+# Response header naming the dictionary needed to decode an x-zdict body
+DICTIONARY_HEADER = "X-Compression-Dictionary"
+
+# DEFLATE only looks back 32 KiB, so a larger dictionary would be partly unused
+DICTIONARY_SIZE = 32 * 1024
+
+# Shortest line worth adding to a dictionary
+MIN_SEGMENT_LENGTH = 4
+
+# Dictionaries by id. They are immutable, so entries never go stale.
+_dictionaries: dict[str, bytes] = {}
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Build a preset dictionary from the lines shared by the most samples.
+
+    Lines, without their indentation, are scored by the bytes they would save
+    across the corpus. The best ones go at the end of the dictionary, where
+    DEFLATE reaches them with the shortest distances.
+    """
+    doc_freq = Counter()
+    for sample in samples:
+        doc_freq.update({
+            line.strip() for line in sample.splitlines() if len(line.strip()) >= MIN_SEGMENT_LENGTH
+        })
+
+    ranked = sorted(
+        ((freq - 1) * len(line.encode("utf-8")), line) for line, freq in doc_freq.items() if freq > 1
+    )
+    chosen = []
+    total = 0
+    for _, line in reversed(ranked):
+        segment = line.encode("utf-8") + b"\n"
+        if total + len(segment) > size:
+            continue
+        chosen.append(segment)
+        total += len(segment)
+    return b"".join(reversed(chosen))
+
+
+def dictionary_id(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def compress(code: str, dictionary: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=dictionary)
+    return compressor.compress(code.encode("utf-8")) + compressor.flush()
+
+
+def decompress(data: bytes, dictionary: bytes) -> str:
+    decompressor = zlib.decompressobj(-15, zdict=dictionary)
+    return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+
+
+class MissingDictionaryError(LookupError):
+    """Raised when code is stored compressed with a dictionary that is not in the database."""
+
+
+def get_dictionary(db: Session, dictionary_id: str) -> bytes:
+    data = _dictionaries.get(dictionary_id)
+    if data is None:
+        dictionary = db.get(models.CompressionDictionary, dictionary_id)
+        if dictionary is None:
+            raise MissingDictionaryError(
+                f"Compression dictionary {dictionary_id} is missing; "
+                "retrain with python -m app.compression train or reseed"
+            )
+        data = dictionary.data
+        _dictionaries[dictionary_id] = data
+    return data
+
+
+def decode(db: Session, code: str | None, compressed: bytes | None, dictionary_id: str | None) -> str:
+    """Return the code of a blob from its stored columns."""
+    if dictionary_id is None:
+        return code
+    return decompress(compressed, get_dictionary(db, dictionary_id))
+
+
+def current_dictionary(db: Session) -> models.CompressionDictionary | None:
+    """The dictionary new code is compressed with, if compression is enabled."""
+    if "compression_dictionary" not in db.info:
+        db.info["compression_dictionary"] = db.query(models.CompressionDictionary).first()
+    return db.info["compression_dictionary"]
+
+
+def store_code(blob: models.Blob, code: str, dictionary: models.CompressionDictionary | None) -> None:
+    """Set the code of a blob, compressed with dictionary when that makes it smaller."""
+    if dictionary is not None:
+        compressed = compress(code, dictionary.data)
+        if len(compressed) < len(code.encode("utf-8")):
+            blob.code = None
+            blob.code_compressed = compressed
+            blob.dictionary_id = dictionary.id
+            return
+    blob.code = code
+    blob.code_compressed = None
+    blob.dictionary_id = None
+
+
+def recompress(db: Session, dictionary: models.CompressionDictionary | None) -> int:
+    """
+    Store the code of every blob with dictionary (or uncompressed when None)
+    and delete the dictionaries no longer used. Does not commit. Returns the
+    number of blobs stored compressed.
+    """
+    compressed = 0
+    for blob in db.query(models.Blob):
+        store_code(blob, blob.source, dictionary)
+        compressed += blob.dictionary_id is not None
+
+    db.flush()
+    query = db.query(models.CompressionDictionary)
+    if dictionary is not None:
+        query = query.filter(models.CompressionDictionary.id != dictionary.id)
+    query.delete()
+    db.info["compression_dictionary"] = dictionary
+    return compressed
+
+
+def train(db: Session, size: int = DICTIONARY_SIZE) -> tuple[models.CompressionDictionary, int]:
+    """
+    Train a dictionary on the current code and recompress every blob with it.
+    Does not commit. Returns (dictionary, number of blobs stored compressed).
+    """
+    data = train_dictionary((blob.source for blob in db.query(models.Blob)), size)
+    dictionary = db.get(models.CompressionDictionary, dictionary_id(data))
+    if dictionary is None:
+        dictionary = models.CompressionDictionary(id=dictionary_id(data), data=data)
+        db.add(dictionary)
+    return dictionary, recompress(db, dictionary)
+
+
+def quality(params: str) -> float:
+    """The q value in the parameters of an Accept-Encoding item: 1 if absent, 0 if malformed."""
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() != "q":
+            continue
+        try:
+            q = float(value)
+        except ValueError:
+            return 0.0
+        return q if 0 <= q <= 1 else 0.0
+    return 1.0
+
+
+def accepts(accept_encoding: str | None, encoding: str = CONTENT_ENCODING) -> bool:
+    """Whether an Accept-Encoding header allows encoding."""
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() != encoding:
+            continue
+        return quality(params) > 0
+    return False
+
+
+def storage_stats(db: Session) -> dict:
+    stats = {"blobs": 0, "compressed": 0, "code_bytes": 0, "stored_bytes": 0, "dictionary_bytes": 0}
+    for blob in db.query(models.Blob):
+        stats["blobs"] += 1
+        stats["code_bytes"] += len(blob.source.encode("utf-8"))
+        if blob.dictionary_id is None:
+            stats["stored_bytes"] += len(blob.code.encode("utf-8"))
+        else:
+            stats["compressed"] += 1
+            stats["stored_bytes"] += len(blob.code_compressed)
+    for dictionary in db.query(models.CompressionDictionary):
+        stats["dictionary_bytes"] += len(dictionary.data)
+    return stats
+
+
+def vacuum(engine: Engine | None = None) -> None:
+    """Give the space freed by recompression back to the filesystem (SQLite only)."""
+    from .database import get_engine
+
+    engine = engine or get_engine()
+    if engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("VACUUM")
+
+
+def main():
+    from .database import SessionLocal
+    from .schema import init_schema
+
+    parser = argparse.ArgumentParser(description="Manage dictionary compression of snippet code")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train_parser = subcommands.add_parser("train", help="Train a dictionary and recompress all code")
+    train_parser.add_argument("--size", type=int, default=DICTIONARY_SIZE, help="Dictionary size in bytes")
+    subcommands.add_parser("stats", help="Show how code is stored")
+    subcommands.add_parser("off", help="Store all code uncompressed")
+    args = parser.parse_args()
+
+    init_schema()
+    with SessionLocal() as db:
+        if args.command == "train":
+            dictionary, compressed = train(db, args.size)
+            db.commit()
+            print(f"Trained dictionary {dictionary.id} ({len(dictionary.data)} bytes)")
+            print(f"  {compressed} blobs stored compressed")
+        elif args.command == "off":
+            recompress(db, None)
+            db.commit()
+            print("All code stored uncompressed")
+
+        stats = storage_stats(db)
+    if args.command != "stats":
+        vacuum()
+
+    ratio = stats["stored_bytes"] / stats["code_bytes"] if stats["code_bytes"] else 1.0
+    print(f"  {stats['compressed']}/{stats['blobs']} blobs compressed")
+    print(f"  code: {stats['code_bytes']} bytes, stored: {stats['stored_bytes']} bytes ({ratio:.0%})")
+    print(f"  dictionaries: {stats['dictionary_bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
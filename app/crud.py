@@ -1,23 +1,86 @@
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from functools import wraps
 
-from . import models
+from sqlalchemy.orm import Session, contains_eager, joinedload, lazyload, load_only
 
+from . import changes, compression, models
+from .facets import CATEGORY, COMPLEXITY, LANGUAGE
+from .fields import Fields
 
+
+def backend(fn):
+    """
+    Route a read to the storage backend when db is not a SQLAlchemy session.
+    Backends (see app/filestore.py) implement methods with the same names and
+    arguments, minus db.
+    """
+    @wraps(fn)
+    def wrapper(db, *args, **kwargs):
+        if not isinstance(db, Session):
+            return getattr(db, fn.__name__)(*args, **kwargs)
+        return fn(db, *args, **kwargs)
+    return wrapper
+
+
+@backend
 def get_languages(db: Session) -> list[models.Language]:
     return db.query(models.Language).all()
 
 
+@backend
 def get_language_by_slug(db: Session, slug: str) -> models.Language | None:
     return db.query(models.Language).filter(models.Language.slug == slug).first()
 
 
+def columns(model, names) -> list:
+    """Mapped columns of model among names, always including the primary key."""
+    return [model.id] + [getattr(model, name) for name in names if name != "id"]
+
+
+def snippet_options(fields: Fields | None, joined: set) -> list:
+    """
+    Load options reading only what the selected fields need. Relationships in
+    joined are already joined by the query and are loaded from that join.
+    """
+    if fields is None:
+        return []
+
+    column_names = [
+        name for name in ("content_hash", "method", "method_title", "language_id", "operation_id",
+                          "validation_status", "validation_message")
+        if name in fields
+    ]
+    options = [load_only(*columns(models.Snippet, column_names))]
+
+    if "code" in fields or "explanation" in fields:
+        blob_columns = [models.Blob.hash]
+        if "code" in fields:
+            blob_columns += [models.Blob.code, models.Blob.code_compressed, models.Blob.dictionary_id]
+        if "explanation" in fields:
+            blob_columns.append(models.Blob.explanation)
+        options.append(joinedload(models.Snippet.blob).load_only(*blob_columns))
+    else:
+        options.append(lazyload(models.Snippet.blob))
+
+    for name, model in (("language", models.Language), ("operation", models.Operation)):
+        relationship = getattr(models.Snippet, name)
+        if name not in fields:
+            options.append(lazyload(relationship))
+            continue
+        load = contains_eager(relationship) if name in joined else joinedload(relationship)
+        options.append(load.load_only(*columns(model, fields[name])))
+    return options
+
+
+@backend
 def get_operations(
     db: Session,
     category: str | None = None,
-    complexity: models.Complexity | None = None
+    complexity: models.Complexity | None = None,
+    fields: Fields | None = None
 ) -> list[models.Operation]:
     query = db.query(models.Operation)
+    if fields is not None:
+        query = query.options(load_only(*columns(models.Operation, fields)))
     if category:
         query = query.filter(models.Operation.category == category)
     if complexity:
@@ -25,45 +88,95 @@ def get_operations(
     return query.order_by(models.Operation.category, models.Operation.name).all()
 
 
+@backend
 def get_operation_by_slug(db: Session, slug: str) -> models.Operation | None:
     return db.query(models.Operation).filter(models.Operation.slug == slug).first()
 
 
+@backend
+def get_related_operations(db: Session, operation: models.Operation) -> list[dict]:
+    rows = (
+        db.query(models.RelatedOperation)
+        .options(joinedload(models.RelatedOperation.related_operation))
+        .filter(models.RelatedOperation.operation_id == operation.id)
+        .order_by(models.RelatedOperation.rank)
+        .all()
+    )
+    return [{"operation": row.related_operation, "score": row.score} for row in rows]
+
+
+@backend
 def get_categories(db: Session) -> list[dict]:
     results = (
-        db.query(
-            models.Operation.category,
-            func.count(models.Operation.id).label("count")
-        )
-        .group_by(models.Operation.category)
+        db.query(models.FacetCount)
+        .filter(models.FacetCount.facet == CATEGORY)
+        .order_by(models.FacetCount.value)
         .all()
     )
     return [
-        {"name": cat.replace("_", " ").title(), "slug": cat, "operation_count": count}
-        for cat, count in results
+        {"name": row.name, "slug": row.value, "operation_count": row.operation_count}
+        for row in results
     ]
 
 
+@backend
+def get_facets(db: Session) -> dict:
+    facets = {CATEGORY: [], COMPLEXITY: [], LANGUAGE: []}
+    for row in db.query(models.FacetCount).order_by(models.FacetCount.value):
+        facets[row.facet].append({
+            "name": row.name,
+            "slug": row.value,
+            "operation_count": row.operation_count,
+            "snippet_count": row.snippet_count,
+        })
+    return {
+        "categories": facets[CATEGORY],
+        "complexities": facets[COMPLEXITY],
+        "languages": facets[LANGUAGE],
+    }
+
+
+@backend
+def get_method_titles(db: Session) -> list[tuple[str, str, str, str]]:
+    """(operation_slug, language_slug, method, method_title) of every snippet with a title."""
+    return (
+        db.query(models.Operation.slug, models.Language.slug, models.Snippet.method, models.Snippet.method_title)
+        .select_from(models.Snippet)
+        .join(models.Operation)
+        .join(models.Language)
+        .filter(models.Snippet.method_title.isnot(None))
+        .order_by(models.Operation.slug, models.Language.slug, models.Snippet.method)
+        .all()
+    )
+
+
+@backend
 def get_snippets(
     db: Session,
     language_slugs: list[str],
-    operation_slug: str | None = None
+    operation_slug: str | None = None,
+    fields: Fields | None = None
 ) -> list[models.Snippet]:
     query = (
         db.query(models.Snippet)
         .join(models.Language)
-        .join(models.Operation)
         .filter(models.Language.slug.in_(language_slugs))
     )
+    joined = {"language"}
     if operation_slug:
-        query = query.filter(models.Operation.slug == operation_slug)
-    return query.all()
+        # Only join operations when filtering on them, so that listing a language
+        # is driven by the snippets (language_id, operation_id) index
+        query = query.join(models.Operation).filter(models.Operation.slug == operation_slug)
+        joined.add("operation")
+    return query.options(*snippet_options(fields, joined)).all()
 
 
+@backend
 def get_snippets_for_comparison(
     db: Session,
     language_slugs: list[str],
-    operation_slug: str
+    operation_slug: str,
+    fields: Fields | None = None
 ) -> dict:
     operation = get_operation_by_slug(db, operation_slug)
     if not operation:
@@ -77,8 +190,133 @@ def get_snippets_for_comparison(
             .join(models.Operation)
             .filter(models.Language.slug == lang_slug)
             .filter(models.Operation.slug == operation_slug)
+            .options(*snippet_options(fields, set()))
             .first()
         )
         snippets[lang_slug] = snippet
 
     return {"operation": operation, "snippets": snippets}
+
+
+@backend
+def get_blob(db: Session, content_hash: str) -> models.Blob | None:
+    return db.get(models.Blob, content_hash)
+
+
+@backend
+def get_compression_dictionary(db: Session, dictionary_id: str) -> bytes | None:
+    dictionary = db.get(models.CompressionDictionary, dictionary_id)
+    return dictionary.data if dictionary else None
+
+
+@backend
+def get_changes(db: Session, since: int, limit: int) -> dict | None:
+    """
+    Up to limit change log entries after since, each with the current state
+    of the item it upserted, plus the log's floor and latest seq. Returns
+    None when the storage backend keeps no change log.
+    """
+    rows = (
+        db.query(models.Change)
+        .filter(models.Change.seq > since)
+        .order_by(models.Change.seq)
+        .limit(limit)
+        .all()
+    )
+
+    ids = {changes.SNIPPET: set(), changes.OPERATION: set(), changes.LANGUAGE: set()}
+    for row in rows:
+        if row.item_id is not None:
+            ids[row.kind].add(row.item_id)
+    items = {}
+    if ids[changes.SNIPPET]:
+        snippets = (
+            db.query(models.Snippet)
+            .options(lazyload(models.Snippet.blob), lazyload(models.Snippet.language), lazyload(models.Snippet.operation))
+            .filter(models.Snippet.id.in_(ids[changes.SNIPPET]))
+        )
+        items.update(((changes.SNIPPET, s.id), s) for s in snippets)
+    for kind, model in ((changes.OPERATION, models.Operation), (changes.LANGUAGE, models.Language)):
+        if ids[kind]:
+            items.update(((kind, item.id), item) for item in db.query(model).filter(model.id.in_(ids[kind])))
+
+    floor = changes.get_floor(db)
+    return {
+        "floor": floor,
+        # The newest entries may be tombstones that have expired
+        "latest": max(changes.latest_seq(db), floor),
+        "changes": [(row, items.get((row.kind, row.item_id))) for row in rows],
+    }
+
+
+@backend
+def get_matrix(db: Session, include_code: bool = False) -> dict:
+    """
+    Build the operation x language x method availability grid in columnar form.
+    Strings are stored once in lookup tables and rows refer to them by index.
+    """
+    columns = [
+        models.Snippet.id,
+        models.Operation.slug,
+        models.Language.slug,
+        models.Snippet.method,
+        models.Snippet.method_title,
+    ]
+    if include_code:
+        columns += [
+            models.Blob.explanation,
+            models.Blob.code,
+            models.Blob.code_compressed,
+            models.Blob.dictionary_id,
+        ]
+
+    query = (
+        db.query(*columns)
+        .select_from(models.Snippet)
+        .join(models.Operation)
+        .join(models.Language)
+    )
+    if include_code:
+        query = query.join(models.Blob)
+    rows = (
+        query.order_by(
+            models.Operation.category,
+            models.Operation.name,
+            models.Language.slug,
+            models.Snippet.method,
+        )
+        .all()
+    )
+    if include_code:
+        rows = [(*row[:5], compression.decode(db, *row[6:]), row[5]) for row in rows]
+    return build_matrix(rows, include_code)
+
+
+def build_matrix(rows, include_code: bool = False) -> dict:
+    """
+    Encode (id, operation_slug, language_slug, method, method_title[, code, explanation])
+    rows into the columnar matrix layout.
+    """
+    tables = {"operations": {}, "languages": {}, "methods": {}, "titles": {}}
+
+    def index(table: str, value: str | None) -> int | None:
+        if value is None:
+            return None
+        return tables[table].setdefault(value, len(tables[table]))
+
+    snippets = {"id": [], "operation": [], "language": [], "method": [], "title": []}
+    if include_code:
+        snippets["code"] = []
+        snippets["explanation"] = []
+
+    for row in rows:
+        snippets["id"].append(row[0])
+        snippets["operation"].append(index("operations", row[1]))
+        snippets["language"].append(index("languages", row[2]))
+        snippets["method"].append(index("methods", row[3]))
+        snippets["title"].append(index("titles", row[4]))
+        if include_code:
+            snippets["code"].append(row[5])
+            snippets["explanation"].append(row[6])
+
+    return {**{table: list(values) for table, values in tables.items()}, "snippets": snippets}
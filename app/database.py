@@ -1,20 +1,125 @@
 import os
+import threading
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////app/codemon.db")
 
-connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+# DATABASE_URL=files:///path selects the read-only file storage backend (app/filestore.py)
+FILE_STORAGE_SCHEME = "files://"
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_engine: Engine | None = None
+# (device, inode) of the SQLite file the engine was created for
+_engine_file: tuple[int, int] | None = None
+_engine_lock = threading.Lock()
+_file_catalog = None
+
+
+def uses_file_storage() -> bool:
+    return SQLALCHEMY_DATABASE_URL.startswith(FILE_STORAGE_SCHEME)
+
+
+def get_file_catalog():
+    """Return the file storage catalog, indexing it on first use."""
+    global _file_catalog
+    if _file_catalog is None:
+        with _engine_lock:
+            if _file_catalog is None:
+                from .filestore import FileCatalog
+
+                _file_catalog = FileCatalog.load(SQLALCHEMY_DATABASE_URL[len(FILE_STORAGE_SCHEME):])
+    return _file_catalog
+
+
+def init_storage() -> None:
+    """Create the engine, or index the file catalog, ahead of the first request."""
+    if uses_file_storage():
+        get_file_catalog()
+    else:
+        get_engine()
+
+
+def sqlite_path(url: str) -> str | None:
+    """Path of the SQLite database file url points to, or None for other databases."""
+    if not url.startswith("sqlite"):
+        return None
+    path = make_url(url).database
+    return path if path and path != ":memory:" else None
+
+
+def _database_file() -> tuple[int, int] | None:
+    path = sqlite_path(SQLALCHEMY_DATABASE_URL)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def get_engine() -> Engine:
+    """
+    Return the shared engine, creating it on first use, and again when the
+    SQLite file has been replaced by a staged build (see app/staging.py).
+    Connections still checked out from the old engine keep reading the old
+    file until they are returned.
+    """
+    global _engine, _engine_file
+    database_file = _database_file()
+    if _engine is None or database_file != _engine_file:
+        with _engine_lock:
+            if _engine is None or database_file != _engine_file:
+                connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+                previous = _engine
+                _engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+                _engine_file = database_file
+                SessionLocal.configure(bind=_engine)
+                if previous is not None:
+                    previous.dispose()
+    return _engine
+
+
+def dispose_engine() -> None:
+    """Close all pooled connections and drop the engine; the next use creates a new one."""
+    global _engine, _engine_file
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            _engine_file = None
+
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker that creates the engine the first time a session is opened."""
+
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
 
+def __getattr__(name: str):
+    # Keep `from app.database import engine` working without building the engine at import
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_db():
-    """Dependency that provides a database session."""
+    """
+    Dependency that provides a database session, or the file catalog when
+    file storage is selected.
+    """
+    if uses_file_storage():
+        yield get_file_catalog()
+        return
     db = SessionLocal()
     try:
         yield db
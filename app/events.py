@@ -0,0 +1,251 @@
+"""
+Server-sent events for catalog changes.
+
+Syncs run in another process, so each API process has one watcher task that
+polls the catalog generation (a single-row read) while anyone is subscribed,
+reads what changed from the change log (see app/changes.py) and fans each
+change out to every subscriber. Clients hold one stream open instead of
+polling the read endpoints.
+
+Every subscriber has a bounded buffer. A subscriber that falls
+SUBSCRIBER_BUFFER events behind is disconnected rather than buffered for;
+events carry their change log seq as id, so the browser's EventSource
+reconnects with Last-Event-ID and the stream replays what it missed from
+the log. Streams send their position as an id as soon as they start, so a
+client that saw no change still resumes from where it was. Streams are also
+closed after MAX_STREAM_SECONDS: uvicorn waits for open connections before
+shutting down, and reconnecting costs one indexed read of the log.
+
+A replay covers at most MAX_REPLAY entries; a client further behind gets a
+"reset" event and reloads the catalog instead.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator
+
+from . import changes, crud, models
+from .catalog import get_generation
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Seconds between generation checks while there are subscribers
+POLL_INTERVAL = 1.0
+
+# Events a subscriber may have waiting before it is disconnected
+SUBSCRIBER_BUFFER = 256
+
+# Seconds between keepalive comments on an idle stream
+HEARTBEAT_INTERVAL = 15.0
+
+# Seconds before a stream is closed for the client to reconnect; below the
+# default 30 second termination grace period of a Kubernetes pod
+MAX_STREAM_SECONDS = 25.0
+
+# Milliseconds EventSource waits before reconnecting
+RETRY_MS = 1000
+
+# Change log entries a stream replays or the watcher catches up on; further
+# behind than this, clients are told to reload the catalog
+MAX_REPLAY = 1000
+
+
+def change_event(change) -> dict:
+    return {
+        "seq": change.seq,
+        "generation": change.generation,
+        "kind": change.kind,
+        "action": change.action,
+        "operation": change.operation,
+        "language": change.language,
+        "method": change.method,
+        "content_hash": change.content_hash,
+    }
+
+
+def format_event(event: str, data, event_id: int | None = None) -> bytes:
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: ".encode("utf-8") + dumps(data) + b"\n\n"
+
+
+def log_position(db) -> int:
+    return max(changes.latest_seq(db), changes.get_floor(db))
+
+
+def read_changes(since: int) -> dict:
+    """
+    The change log entries after since, or None for changes when they cannot
+    be replayed: since is below the floor or ahead of the log, or more than
+    MAX_REPLAY entries behind.
+    """
+    from .database import get_db
+
+    with contextmanager(get_db)() as db:
+        floor = changes.get_floor(db)
+        latest = log_position(db)
+        if since < floor or since > latest or latest - since > MAX_REPLAY:
+            return {"latest": latest, "changes": None}
+        rows = (
+            db.query(models.Change)
+            .filter(models.Change.seq > since, models.Change.seq <= latest)
+            .order_by(models.Change.seq)
+            .all()
+        )
+        return {"latest": latest, "changes": [change_event(row) for row in rows]}
+
+
+def has_change_log() -> bool:
+    from .database import get_db
+
+    with contextmanager(get_db)() as db:
+        return crud.get_changes(db, 0, 0) is not None
+
+
+def read_position() -> tuple[int, int]:
+    """(catalog generation, latest change log seq)."""
+    from .database import get_db
+
+    with contextmanager(get_db)() as db:
+        return get_generation(db), log_position(db)
+
+
+def read_generation() -> int:
+    from .database import get_db
+
+    with contextmanager(get_db)() as db:
+        return get_generation(db)
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self.dropped = False
+
+
+class Broadcaster:
+    """Fans change log entries out to subscribers, watching for them only while there are any."""
+
+    def __init__(self):
+        self.subscribers: set[Subscriber] = set()
+        self._watcher: asyncio.Task | None = None
+        # Position of the watcher in the change log, known once ready is set
+        self.seq: int | None = None
+        self.ready = asyncio.Event()
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: dict, event_id: int | None = None) -> None:
+        message = (event, data, event_id)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: it reconnects and replays from the change log
+                subscriber.dropped = True
+                self.subscribers.discard(subscriber)
+                logger.info("Dropped a change stream subscriber %d events behind", subscriber.queue.qsize())
+
+    async def _watch(self) -> None:
+        generation = None
+        try:
+            while self.subscribers:
+                try:
+                    if self.seq is None:
+                        # Changes up to here are replayed by each subscriber, later ones broadcast
+                        generation, self.seq = await asyncio.to_thread(read_position)
+                        self.ready.set()
+                    else:
+                        current = await asyncio.to_thread(read_generation)
+                        if current != generation:
+                            generation = current
+                            await self._catch_up()
+                except Exception:
+                    # Subscribers stay connected while the database is unavailable
+                    logger.exception("Failed to read catalog changes")
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            self.ready.clear()
+            self.seq = None
+
+    async def _catch_up(self) -> None:
+        feed = await asyncio.to_thread(read_changes, self.seq)
+        if feed["changes"] is None:
+            self.publish("reset", {"latest": feed["latest"]}, feed["latest"])
+        else:
+            for change in feed["changes"]:
+                self.publish("change", change, change["seq"])
+        self.seq = max(self.seq, feed["latest"])
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        self.subscribers.clear()
+
+
+broadcaster = Broadcaster()
+
+
+async def stream(since: int | None, is_disconnected) -> AsyncIterator[bytes]:
+    """
+    Events for one client: the changes after since, if given, then every new
+    change as it is committed. A "reset" event means the client is too far
+    behind to catch up from the log and has to reload the catalog.
+    """
+    # Counts from the start, so that waiting for the broadcaster is bounded too
+    deadline = time.monotonic() + MAX_STREAM_SECONDS
+    subscriber = broadcaster.subscribe()
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode("utf-8")
+        while not broadcaster.ready.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or await is_disconnected():
+                return
+            try:
+                await asyncio.wait_for(broadcaster.ready.wait(), timeout=min(HEARTBEAT_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+
+        # Everything after sent arrives through the subscriber queue
+        sent = broadcaster.seq
+        if since is not None:
+            feed = await asyncio.to_thread(read_changes, since)
+            if feed["changes"] is None:
+                yield format_event("reset", {"latest": feed["latest"]}, feed["latest"])
+            else:
+                for change in feed["changes"]:
+                    yield format_event("change", change, change["seq"])
+            sent = feed["latest"]
+        # Sets the client's last event id even if no change follows, so that
+        # it reconnects from here rather than from whatever is latest by then
+        yield f"id: {sent}\n\n".encode("utf-8")
+
+        while not subscriber.dropped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or await is_disconnected():
+                return
+            try:
+                event, data, event_id = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=min(HEARTBEAT_INTERVAL, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event == "change" and event_id <= sent:
+                # Already sent while replaying
+                continue
+            sent = max(sent, event_id)
+            yield format_event(event, data, event_id)
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,343 @@
+"""
+Static export of the read API.
+
+The catalog is read-only between syncs, so every response the hot paths can
+produce is pre-rendered to a JSON file with a gzip sibling, for a CDN or a
+static file server to serve ahead of the app:
+
+    api/languages.json                              /api/languages
+    api/languages/{slug}.json                       /api/languages/{slug}
+    api/operations.json                             /api/operations
+    api/operations/category/{category}.json         /api/operations?category=...
+    api/operations/complexity/{complexity}.json     /api/operations?complexity=...
+    api/operations/category/{c}/complexity/{x}.json /api/operations?category=...&complexity=...
+    api/operations/{slug}.json                      /api/operations/{slug}
+    api/operations/{slug}/related.json              /api/operations/{slug}/related
+    api/categories.json, api/facets.json            /api/categories, /api/facets
+    api/matrix.json, api/matrix/code.json           /api/matrix, /api/matrix?code=true
+    api/snippets/{langs}.json                       /api/snippets?languages={langs}
+    api/snippets/{langs}/{operation}.json           /api/snippets?languages={langs}&operation=...
+    api/snippets/compare/{langs}/{operation}.json   /api/snippets/compare?languages={langs}&operation=...
+    api/blobs/{content_hash}.json                   /api/blobs/{content_hash}
+
+{langs} is every combination of up to MAX_LANGUAGES language slugs, in
+alphabetical order; requests listing languages in another order, and any
+other query, fall through to the app. Snippet listings without snippets are
+not exported. manifest.json maps each URL to its file and the SHA-256 of its
+content.
+
+Exports are incremental. The manifest records, for each page, a digest of
+what it is rendered from: the content_hash and metadata of the snippets it
+shows, the content_hash of a blob, or the whole catalog for the few small
+pages derived from all of it. Pages whose source is unchanged since the
+previous export are not rendered at all; pages rendered to the same bytes
+are not rewritten; files that are no longer produced are removed.
+Rendering, compression and writes run in a thread pool, each page reading
+through a session of its own.
+
+    python -m app.export --output static/
+    python -m app.export --output static/ --workers 8
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import combinations
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator
+
+from . import crud
+from .catalog import get_generation
+from .fields import SNIPPET_REF
+from .models import Complexity
+from .routers.snippets import MAX_LANGUAGES
+from .serialization import (
+    Encoder,
+    dumps,
+    encode_comparison,
+    encode_languages,
+    encode_operations,
+    encode_related_operations,
+    encode_snippets,
+)
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 2
+
+
+@dataclass(frozen=True, slots=True)
+class Page:
+    url: str
+    path: str
+    # Digest of everything the page is rendered from; unchanged means the page is too
+    source: str
+    render: Callable[[object], bytes]
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cell_digests(db, slugs: list[str]) -> tuple[dict[tuple[str, str], str], set[str]]:
+    """
+    Digest of the snippets of each (operation, language) pair, read without
+    their content, which content_hash stands for; and every content_hash.
+    """
+    encoder = Encoder()
+    cells = defaultdict(list)
+    content_hashes = set()
+    for snippet in crud.get_snippets(db, slugs, fields=SNIPPET_REF):
+        cells[(snippet.operation.slug, snippet.language.slug)].append(encoder.project(snippet, SNIPPET_REF))
+        content_hashes.add(snippet.content_hash)
+    return {cell: digest(dumps(snippets)) for cell, snippets in cells.items()}, content_hashes
+
+
+def plan_pages(db) -> Iterator[Page]:
+    """
+    Every exported page, with its source digest. Pages are rendered later,
+    from their own session, and only if their source changed.
+
+    Snippet listings and comparisons are keyed on the snippets of the cells
+    they show, and blobs on their content_hash. The remaining pages are few
+    and derived from the whole catalog (facets, related operations, the
+    matrix), so they share one key covering every cell and the generation.
+    """
+    encoder = Encoder()
+    languages = crud.get_languages(db)
+    operations = crud.get_operations(db)
+    slugs = sorted(language.slug for language in languages)
+    cells, content_hashes = cell_digests(db, slugs)
+    catalog = digest(dumps([
+        get_generation(db),
+        [encoder.language(language) for language in languages],
+        [encoder.operation(op) for op in operations],
+        sorted(cells.items()),
+    ]))
+
+    yield Page("/api/languages", "api/languages.json", catalog, lambda db: encode_languages(crud.get_languages(db)))
+    for language in languages:
+        yield Page(
+            f"/api/languages/{language.slug}",
+            f"api/languages/{language.slug}.json",
+            catalog,
+            lambda db, slug=language.slug: dumps(Encoder().language(crud.get_language_by_slug(db, slug))),
+        )
+
+    yield Page("/api/operations", "api/operations.json", catalog, lambda db: encode_operations(crud.get_operations(db)))
+    categories = sorted({op.category for op in operations})
+    complexities = sorted({op.complexity.value for op in operations})
+    for category in categories:
+        yield Page(
+            f"/api/operations?category={category}",
+            f"api/operations/category/{category}.json",
+            catalog,
+            lambda db, category=category: encode_operations(crud.get_operations(db, category=category)),
+        )
+    for complexity in complexities:
+        yield Page(
+            f"/api/operations?complexity={complexity}",
+            f"api/operations/complexity/{complexity}.json",
+            catalog,
+            lambda db, complexity=complexity: encode_operations(
+                crud.get_operations(db, complexity=Complexity(complexity))
+            ),
+        )
+    for category, complexity in sorted({(op.category, op.complexity.value) for op in operations}):
+        yield Page(
+            f"/api/operations?category={category}&complexity={complexity}",
+            f"api/operations/category/{category}/complexity/{complexity}.json",
+            catalog,
+            lambda db, category=category, complexity=complexity: encode_operations(
+                crud.get_operations(db, category=category, complexity=Complexity(complexity))
+            ),
+        )
+    for op in operations:
+        yield Page(
+            f"/api/operations/{op.slug}",
+            f"api/operations/{op.slug}.json",
+            catalog,
+            lambda db, slug=op.slug: dumps(Encoder().operation(crud.get_operation_by_slug(db, slug))),
+        )
+        yield Page(
+            f"/api/operations/{op.slug}/related",
+            f"api/operations/{op.slug}/related.json",
+            catalog,
+            lambda db, slug=op.slug: encode_related_operations(
+                crud.get_related_operations(db, crud.get_operation_by_slug(db, slug))
+            ),
+        )
+
+    yield Page("/api/categories", "api/categories.json", catalog, lambda db: dumps(crud.get_categories(db)))
+    yield Page("/api/facets", "api/facets.json", catalog, lambda db: dumps(crud.get_facets(db)))
+    for code, url, path in ((False, "/api/matrix", "api/matrix.json"),
+                            (True, "/api/matrix?code=true", "api/matrix/code.json")):
+        yield Page(
+            url, path, catalog,
+            lambda db, code=code: dumps({"generation": get_generation(db), **crud.get_matrix(db, include_code=code)}),
+        )
+
+    for count in range(1, min(MAX_LANGUAGES, len(slugs)) + 1):
+        for combo in combinations(slugs, count):
+            langs = ",".join(combo)
+            yield Page(
+                f"/api/snippets?languages={langs}",
+                f"api/snippets/{langs}.json",
+                digest(dumps([[op.slug, [cells.get((op.slug, slug)) for slug in combo]] for op in operations])),
+                lambda db, combo=combo: encode_snippets(crud.get_snippets(db, list(combo))),
+            )
+            for op in operations:
+                op_cells = [cells.get((op.slug, slug)) for slug in combo]
+                if any(op_cells):
+                    yield Page(
+                        f"/api/snippets?languages={langs}&operation={op.slug}",
+                        f"api/snippets/{langs}/{op.slug}.json",
+                        digest(dumps(op_cells)),
+                        lambda db, combo=combo, slug=op.slug: encode_snippets(
+                            crud.get_snippets(db, list(combo), slug)
+                        ),
+                    )
+                yield Page(
+                    f"/api/snippets/compare?languages={langs}&operation={op.slug}",
+                    f"api/snippets/compare/{langs}/{op.slug}.json",
+                    digest(dumps([encoder.operation(op), op_cells])),
+                    lambda db, combo=combo, slug=op.slug: encode_comparison(
+                        crud.get_snippets_for_comparison(db, list(combo), slug)
+                    ),
+                )
+
+    for content_hash in sorted(content_hashes):
+        yield Page(
+            f"/api/blobs/{content_hash}",
+            f"api/blobs/{content_hash}.json",
+            content_hash,
+            lambda db, content_hash=content_hash: dumps(Encoder().blob(crud.get_blob(db, content_hash))),
+        )
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """Write data atomically, so a server never sees a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_page(output: Path, path: str, body: bytes) -> int:
+    """Write a page and its gzip sibling. Returns the compressed size."""
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    write_file(output / path, body)
+    write_file(output / f"{path}.gz", compressed)
+    return len(compressed)
+
+
+def load_manifest(output: Path) -> dict:
+    try:
+        manifest = json.loads((output / MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return manifest.get("files", {}) if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def build_page(open_db: Callable[[], ContextManager], output: Path, page: Page, old: dict | None) -> dict:
+    """Render a page from a session of its own and write it if its content changed. Returns its manifest entry."""
+    with open_db() as db:
+        body = page.render(db)
+    entry = {"path": page.path, "source": page.source, "sha256": digest(body), "size": len(body)}
+    if old is not None and old["sha256"] == entry["sha256"] and is_current(output, old, page.path):
+        entry["gzip_size"] = old["gzip_size"]
+        entry["written"] = False
+    else:
+        entry["gzip_size"] = write_page(output, page.path, body)
+        entry["written"] = True
+    return entry
+
+
+def is_current(output: Path, old: dict, path: str) -> bool:
+    return old["path"] == path and (output / path).exists() and (output / f"{path}.gz").exists()
+
+
+def export(
+    db,
+    output: Path,
+    workers: int | None = None,
+    open_db: Callable[[], ContextManager] | None = None,
+) -> dict:
+    """
+    Export every page to output, rendering only pages whose source changed
+    since the previous export, in a thread pool whose jobs each open a
+    session with open_db. Returns counts of rendered, written, unchanged and
+    removed files.
+    """
+    if open_db is None:
+        from .database import get_db
+
+        open_db = contextmanager(get_db)
+    output.mkdir(parents=True, exist_ok=True)
+    previous = load_manifest(output)
+    generation = get_generation(db)
+    files = {}
+    pending = {}
+    stats = {"pages": 0, "rendered": 0, "written": 0, "unchanged": 0, "removed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page in plan_pages(db):
+            stats["pages"] += 1
+            old = previous.get(page.url)
+            if old is not None and old.get("source") == page.source and is_current(output, old, page.path):
+                files[page.url] = old
+            else:
+                pending[page.url] = pool.submit(build_page, open_db, output, page, old)
+
+        for url, future in pending.items():
+            entry = future.result()
+            stats["written"] += entry.pop("written")
+            files[url] = entry
+    stats["rendered"] = len(pending)
+    stats["unchanged"] = stats["pages"] - stats["written"]
+
+    if get_generation(db) != generation:
+        # Pages may mix two catalogs; keep the previous manifest so that the next run renders them again
+        raise RuntimeError("The catalog changed during the export; run it again")
+
+    current_paths = {entry["path"] for entry in files.values()}
+    for url, entry in previous.items():
+        if entry["path"] in current_paths:
+            continue
+        for stale in (output / entry["path"], output / f"{entry['path']}.gz"):
+            stale.unlink(missing_ok=True)
+        stats["removed"] += 1
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generation": generation,
+        "files": dict(sorted(files.items())),
+    }
+    write_file(output / MANIFEST, json.dumps(manifest, indent=1).encode("utf-8"))
+    return stats
+
+
+def main():
+    from .database import get_db, init_storage
+
+    parser = argparse.ArgumentParser(description="Pre-render the read API to static JSON files")
+    parser.add_argument("--output", "-o", type=Path, required=True, help="Output directory")
+    parser.add_argument("--workers", type=int, default=None, help="Threads rendering, compressing and writing pages")
+    args = parser.parse_args()
+
+    init_storage()
+    with contextmanager(get_db)() as db:
+        stats = export(db, args.output, args.workers)
+    print(
+        f"Exported {stats['pages']} pages to {args.output}: {stats['rendered']} rendered, "
+        f"{stats['written']} written, {stats['unchanged']} unchanged, {stats['removed']} removed"
+    )
+
+
+if __name__ == "__main__":
+    main()
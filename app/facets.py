@@ -0,0 +1,137 @@
+"""
+Materialized facet aggregates.
+
+The facet_counts table holds operation and snippet counts per category, per
+complexity and per language so that /api/categories and /api/facets never
+have to aggregate over the operations or snippets tables at request time.
+
+seed_data rebuilds the table from scratch; sync_snippets applies a FacetDelta
+describing only what it added or removed.
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import distinct, func
+from sqlalchemy.orm import Session
+
+from . import models
+
+CATEGORY = "category"
+COMPLEXITY = "complexity"
+LANGUAGE = "language"
+
+
+def category_name(category: str) -> str:
+    """Display name for a category slug."""
+    return category.replace("_", " ").title()
+
+
+def complexity_name(complexity: models.Complexity) -> str:
+    """Display name for a complexity level."""
+    return complexity.value.replace("_", " ").title()
+
+
+class FacetDelta:
+    """Accumulates count changes to apply to the facet_counts table."""
+
+    def __init__(self):
+        # (facet, value) -> [name, operation_count delta, snippet_count delta]
+        self.changes = defaultdict(lambda: [None, 0, 0])
+
+    def _add(self, facet: str, value: str, name: str, operations: int, snippets: int):
+        change = self.changes[(facet, value)]
+        change[0] = name
+        change[1] += operations
+        change[2] += snippets
+
+    def add_operation(self, operation: models.Operation, sign: int = 1):
+        """Count an operation in its category and complexity."""
+        self._add(CATEGORY, operation.category, category_name(operation.category), sign, 0)
+        self._add(
+            COMPLEXITY, operation.complexity.value, complexity_name(operation.complexity), sign, 0
+        )
+
+    def add_snippet(self, operation: models.Operation, language: models.Language, sign: int = 1):
+        """Count a snippet in its operation's category and complexity and in its language."""
+        self._add(CATEGORY, operation.category, category_name(operation.category), 0, sign)
+        self._add(
+            COMPLEXITY, operation.complexity.value, complexity_name(operation.complexity), 0, sign
+        )
+        self._add(LANGUAGE, language.slug, language.name, 0, sign)
+
+    def add_language_operation(self, language: models.Language, sign: int = 1):
+        """Count an operation as available (or no longer available) in a language."""
+        self._add(LANGUAGE, language.slug, language.name, sign, 0)
+
+    def apply(self, db: Session) -> None:
+        """Apply the accumulated changes. Does not commit."""
+        for (facet, value), (name, operations, snippets) in self.changes.items():
+            if not operations and not snippets:
+                continue
+            row = db.get(models.FacetCount, (facet, value))
+            if row is None:
+                row = models.FacetCount(
+                    facet=facet, value=value, name=name, operation_count=0, snippet_count=0
+                )
+                db.add(row)
+            row.operation_count += operations
+            row.snippet_count += snippets
+            if row.operation_count <= 0 and row.snippet_count <= 0:
+                if row in db.new:
+                    db.expunge(row)
+                else:
+                    db.delete(row)
+        db.flush()
+        self.changes.clear()
+
+
+def rebuild_facets(db: Session) -> int:
+    """
+    Recompute every facet from the operations and snippets tables.
+    Does not commit. Returns the number of facet rows written.
+    """
+    rows = {}
+
+    def row(facet: str, value: str, name: str) -> models.FacetCount:
+        if (facet, value) not in rows:
+            rows[(facet, value)] = models.FacetCount(
+                facet=facet, value=value, name=name, operation_count=0, snippet_count=0
+            )
+        return rows[(facet, value)]
+
+    for column, facet, name_fn in (
+        (models.Operation.category, CATEGORY, category_name),
+        (models.Operation.complexity, COMPLEXITY, complexity_name),
+    ):
+        for value, count in db.query(column, func.count(models.Operation.id)).group_by(column):
+            key = value.value if isinstance(value, models.Complexity) else value
+            row(facet, key, name_fn(value)).operation_count = count
+
+        snippet_counts = (
+            db.query(column, func.count(models.Snippet.id))
+            .select_from(models.Snippet)
+            .join(models.Snippet.operation)
+            .group_by(column)
+        )
+        for value, count in snippet_counts:
+            key = value.value if isinstance(value, models.Complexity) else value
+            row(facet, key, name_fn(value)).snippet_count = count
+
+    language_counts = (
+        db.query(
+            models.Language.slug,
+            models.Language.name,
+            func.count(distinct(models.Snippet.operation_id)),
+            func.count(models.Snippet.id),
+        )
+        .join(models.Language.snippets)
+        .group_by(models.Language.slug, models.Language.name)
+    )
+    for slug, name, operation_count, snippet_count in language_counts:
+        facet_row = row(LANGUAGE, slug, name)
+        facet_row.operation_count = operation_count
+        facet_row.snippet_count = snippet_count
+
+    db.query(models.FacetCount).delete()
+    db.add_all(rows.values())
+    return len(rows)
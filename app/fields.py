@@ -0,0 +1,90 @@
+"""
+Sparse fieldsets.
+
+`fields=id,method_title,language.slug` selects which fields each item of a
+response contains; a nested object named on its own (`language`) keeps all
+of its fields. crud turns the selection into load options, so columns,
+joins and blobs that are not needed are never read from the database.
+"""
+
+from fastapi import HTTPException
+
+LANGUAGE_FIELDS = ("name", "slug", "id")
+OPERATION_FIELDS = ("name", "slug", "category", "description", "complexity", "id")
+
+# Selectable fields per item type, in response order. Nested objects list their fields.
+OPERATION = {name: None for name in OPERATION_FIELDS}
+SNIPPET = {
+    "id": None,
+    "code": None,
+    "explanation": None,
+    "content_hash": None,
+    "method": None,
+    "method_title": None,
+    "language": LANGUAGE_FIELDS,
+    "operation": OPERATION_FIELDS,
+    "validation_status": None,
+    "validation_message": None,
+}
+COMPARED_SNIPPET = {
+    "code": None,
+    "explanation": None,
+    "id": None,
+    "language_id": None,
+    "operation_id": None,
+    "content_hash": None,
+    "method": None,
+    "method_title": None,
+    "validation_status": None,
+    "validation_message": None,
+}
+
+# field -> None for a value, or the selected fields of a nested object
+Fields = dict[str, tuple[str, ...] | None]
+
+# Everything but content, for responses referencing blobs by content_hash
+SNIPPET_REF: Fields = {name: nested for name, nested in SNIPPET.items() if name not in ("code", "explanation")}
+COMPARED_SNIPPET_REF: Fields = {
+    name: nested for name, nested in COMPARED_SNIPPET.items() if name not in ("code", "explanation")
+}
+
+
+def describe(available: dict) -> str:
+    return "Comma-separated fields to return: " + ", ".join(
+        f"{name}[.{'|'.join(nested)}]" if nested else name for name, nested in available.items()
+    )
+
+
+def parse_fields(value: str | None, available: dict) -> Fields | None:
+    """Parse a fields parameter. Returns None to select every field."""
+    if not value or not value.strip():
+        return None
+
+    requested: dict[str, set[str] | None] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, nested = item.partition(".")
+        if name not in available or (nested and nested not in (available[name] or ())):
+            raise HTTPException(status_code=400, detail=f"Unknown field: {item}")
+        if available[name] is None or not nested:
+            requested[name] = None
+        elif requested.get(name, set()) is not None:
+            requested.setdefault(name, set()).add(nested)
+
+    fields = {}
+    for name, nested in available.items():
+        if name not in requested:
+            continue
+        if nested is None:
+            fields[name] = None
+        else:
+            selected = requested[name]
+            fields[name] = tuple(f for f in nested if selected is None or f in selected)
+    return fields
+
+
+def key(fields: Fields | None) -> tuple | None:
+    """Hashable form of a selection, e.g. for coalescing identical requests."""
+    return tuple(fields.items()) if fields is not None else None
@@ -0,0 +1,447 @@
+"""
+File-tree storage backend.
+
+Serves every read endpoint straight from the snippets/ tree, with no database
+and no ORM on the read path. The tree is indexed once at startup, or a prebuilt
+index file is loaded instead. Select it through DATABASE_URL:
+
+    DATABASE_URL=files:///app/snippets              # index the tree at startup
+    DATABASE_URL=files:///app/catalog-index.json    # load a prebuilt index
+
+Build an index file with:
+
+    python -m app.filestore --output catalog-index.json
+    python -m app.filestore --output catalog-index.json --validate  # with syntax check results
+
+FileCatalog implements the read functions of app.crud under the same names;
+crud routes calls to it whenever the request's db is not a SQLAlchemy session.
+"""
+
+import argparse
+import json
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import related, validation
+from .crud import build_matrix
+from .fields import Fields
+from .facets import CATEGORY, COMPLEXITY, LANGUAGE, category_name, complexity_name
+from .models import Complexity
+from .snippet_tree import (
+    LANGUAGES,
+    OPERATIONS,
+    SNIPPETS_DIR,
+    compute_hash,
+    load_operation_metadata,
+    scan_tree,
+)
+
+INDEX_VERSION = 1
+
+
+@dataclass(slots=True)
+class FileLanguage:
+    id: int
+    name: str
+    slug: str
+
+
+@dataclass(slots=True)
+class FileOperation:
+    id: int
+    name: str
+    slug: str
+    category: str
+    description: str | None
+    complexity: Complexity
+
+
+@dataclass(slots=True)
+class FileSnippet:
+    id: int
+    language_id: int
+    operation_id: int
+    method: str
+    method_title: str | None
+    code: str
+    explanation: str | None
+    content_hash: str
+    language: FileLanguage = field(repr=False)
+    operation: FileOperation = field(repr=False)
+    validation_status: str | None = None
+    validation_message: str | None = None
+
+
+@dataclass(slots=True)
+class FileBlob:
+    hash: str
+    code: str
+    explanation: str | None
+    # Code is never stored compressed in a file catalog
+    code_compressed: None = None
+    dictionary_id: None = None
+
+    @property
+    def source(self) -> str:
+        return self.code
+
+
+class FileCatalog:
+    """Immutable in-memory catalog with the lookups needed by every read endpoint."""
+
+    def __init__(
+        self,
+        languages: list[FileLanguage],
+        operations: list[FileOperation],
+        snippets: list[FileSnippet],
+        related_slugs: dict[str, list[tuple[str, float]]],
+        generation: int
+    ):
+        self.generation = generation
+        self.languages = languages
+        self.operations = operations
+        self.snippets = snippets
+        self.related_slugs = related_slugs
+
+        self._languages_by_slug = {lang.slug: lang for lang in languages}
+        self._operations_by_slug = {op.slug: op for op in operations}
+        self._snippets_by_language = defaultdict(list)
+        self._snippets_by_pair = defaultdict(list)
+        self._blobs = {}
+        for snippet in snippets:
+            if snippet.content_hash not in self._blobs:
+                self._blobs[snippet.content_hash] = FileBlob(
+                    snippet.content_hash, snippet.code, snippet.explanation
+                )
+            self._snippets_by_language[snippet.language.slug].append(snippet)
+            self._snippets_by_pair[(snippet.operation.slug, snippet.language.slug)].append(snippet)
+
+        self._facets = self._compute_facets()
+        self._matrix_rows = [
+            (s.id, s.operation.slug, s.language.slug, s.method, s.method_title, s.code, s.explanation)
+            for s in sorted(
+                snippets,
+                key=lambda s: (s.operation.category, s.operation.name, s.language.slug, s.method)
+            )
+        ]
+
+    # Construction
+
+    @classmethod
+    def from_tree(cls, snippets_dir: Path = SNIPPETS_DIR) -> "FileCatalog":
+        """Index a snippets/ tree."""
+        languages = [
+            FileLanguage(id=i, name=lang["name"], slug=lang["slug"])
+            for i, lang in enumerate(LANGUAGES, start=1)
+        ]
+        languages_by_slug = {lang.slug: lang for lang in languages}
+
+        operations = {
+            op["slug"]: FileOperation(id=i, **op)
+            for i, op in enumerate(OPERATIONS, start=1)
+        }
+
+        snippets = []
+        metadata_cache = {}
+        for op_slug, lang_slug, method, code_file, complexity in scan_tree(snippets_dir):
+            if op_slug not in operations:
+                operations[op_slug] = FileOperation(
+                    id=len(operations) + 1,
+                    name=op_slug.replace("-", " ").title(),
+                    slug=op_slug,
+                    category="custom",
+                    description=f"Custom operation: {op_slug}",
+                    complexity=complexity
+                )
+
+            op_dir = code_file.parent.parent
+            if op_dir not in metadata_cache:
+                metadata_cache[op_dir] = load_operation_metadata(op_dir)
+            method_metadata = metadata_cache[op_dir].get(lang_slug, {}).get(method, {})
+            code = code_file.read_text(encoding="utf-8")
+            explanation = method_metadata.get("explanation")
+
+            snippets.append(FileSnippet(
+                id=len(snippets) + 1,
+                language_id=languages_by_slug[lang_slug].id,
+                operation_id=operations[op_slug].id,
+                method=method,
+                method_title=method_metadata.get("title"),
+                code=code,
+                explanation=explanation,
+                content_hash=compute_hash(code, explanation),
+                language=languages_by_slug[lang_slug],
+                operation=operations[op_slug]
+            ))
+
+        operations = list(operations.values())
+        return cls(
+            languages,
+            operations,
+            snippets,
+            cls._compute_related(operations, snippets),
+            cls._compute_generation(operations, snippets)
+        )
+
+    @classmethod
+    def from_index(cls, data: dict) -> "FileCatalog":
+        """Load a catalog from the output of to_index()."""
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported catalog index version: {data.get('version')}")
+
+        languages = [FileLanguage(**lang) for lang in data["languages"]]
+        operations = [
+            FileOperation(**{**op, "complexity": Complexity(op["complexity"])})
+            for op in data["operations"]
+        ]
+        languages_by_id = {lang.id: lang for lang in languages}
+        operations_by_id = {op.id: op for op in operations}
+        snippets = [
+            FileSnippet(
+                **snippet,
+                language=languages_by_id[snippet["language_id"]],
+                operation=operations_by_id[snippet["operation_id"]]
+            )
+            for snippet in data["snippets"]
+        ]
+        related_slugs = {
+            slug: [(other, score) for other, score in neighbours]
+            for slug, neighbours in data["related"].items()
+        }
+        return cls(languages, operations, snippets, related_slugs, data["generation"])
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FileCatalog":
+        """Index a snippets directory, or load an index file."""
+        path = Path(path)
+        if path.is_dir():
+            return cls.from_tree(path)
+        return cls.from_index(json.loads(path.read_text(encoding="utf-8")))
+
+    def to_index(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "generation": self.generation,
+            "languages": [
+                {"id": lang.id, "name": lang.name, "slug": lang.slug} for lang in self.languages
+            ],
+            "operations": [
+                {
+                    "id": op.id,
+                    "name": op.name,
+                    "slug": op.slug,
+                    "category": op.category,
+                    "description": op.description,
+                    "complexity": op.complexity.value,
+                }
+                for op in self.operations
+            ],
+            "snippets": [
+                {
+                    "id": s.id,
+                    "language_id": s.language_id,
+                    "operation_id": s.operation_id,
+                    "method": s.method,
+                    "method_title": s.method_title,
+                    "code": s.code,
+                    "explanation": s.explanation,
+                    "content_hash": s.content_hash,
+                    "validation_status": s.validation_status,
+                    "validation_message": s.validation_message,
+                }
+                for s in self.snippets
+            ],
+            "related": self.related_slugs,
+        }
+
+    @staticmethod
+    def _compute_related(
+        operations: list[FileOperation],
+        snippets: list[FileSnippet]
+    ) -> dict[str, list[tuple[str, float]]]:
+        documents = {op.id: Counter() for op in operations}
+        for op in operations:
+            related.add_text(documents[op.id], "name", op.name)
+            related.add_text(documents[op.id], "description", op.description)
+        for snippet in snippets:
+            related.add_text(documents[snippet.operation_id], "explanation", snippet.explanation)
+            related.add_text(documents[snippet.operation_id], "code", snippet.code)
+
+        neighbours = related.compute_neighbours(related.tfidf_vectors(list(documents.values())))
+        return {
+            op.slug: [(operations[j].slug, round(float(score), 6)) for j, score in op_neighbours]
+            for op, op_neighbours in zip(operations, neighbours)
+        }
+
+    @staticmethod
+    def _compute_generation(operations: list[FileOperation], snippets: list[FileSnippet]) -> int:
+        """Stable fingerprint of the catalog content, used as its generation."""
+        checksum = 0
+        for op in operations:
+            checksum = zlib.crc32(f"{op.slug}|{op.name}|{op.category}".encode("utf-8"), checksum)
+        for snippet in sorted(snippets, key=lambda s: (s.operation.slug, s.language.slug, s.method)):
+            key = f"{snippet.operation.slug}/{snippet.language.slug}/{snippet.method}|{snippet.content_hash}"
+            checksum = zlib.crc32(key.encode("utf-8"), checksum)
+        return checksum
+
+    def _compute_facets(self) -> dict:
+        counts = {}
+
+        def count(facet: str, value: str, name: str) -> dict:
+            if (facet, value) not in counts:
+                counts[(facet, value)] = {
+                    "name": name, "slug": value, "operation_count": 0, "snippet_count": 0
+                }
+            return counts[(facet, value)]
+
+        for op in self.operations:
+            count(CATEGORY, op.category, category_name(op.category))["operation_count"] += 1
+            count(COMPLEXITY, op.complexity.value, complexity_name(op.complexity))["operation_count"] += 1
+        for snippet in self.snippets:
+            op = snippet.operation
+            count(CATEGORY, op.category, category_name(op.category))["snippet_count"] += 1
+            count(COMPLEXITY, op.complexity.value, complexity_name(op.complexity))["snippet_count"] += 1
+            count(LANGUAGE, snippet.language.slug, snippet.language.name)["snippet_count"] += 1
+        for op_slug, lang_slug in self._snippets_by_pair:
+            language = self._languages_by_slug[lang_slug]
+            count(LANGUAGE, lang_slug, language.name)["operation_count"] += 1
+
+        facets = {CATEGORY: [], COMPLEXITY: [], LANGUAGE: []}
+        for (facet, value), row in sorted(counts.items()):
+            facets[facet].append(row)
+        return {
+            "categories": facets[CATEGORY],
+            "complexities": facets[COMPLEXITY],
+            "languages": facets[LANGUAGE],
+        }
+
+    def validate(self, workers: int | None = None) -> Counter:
+        """Syntax-check every snippet and set its validation status. Returns the number per status."""
+        jobs = []
+        checked = []
+        for snippet in self.snippets:
+            checker = validation.checker_for(snippet.language.slug)
+            if checker is None:
+                snippet.validation_status = validation.UNCHECKED
+                snippet.validation_message = validation.NO_CHECKER_MESSAGE
+                continue
+            jobs.append((checker, snippet.code))
+            checked.append(snippet)
+        for snippet, (status, message) in zip(checked, validation.check_all(jobs, workers)):
+            snippet.validation_status = status
+            snippet.validation_message = message
+        return Counter(snippet.validation_status for snippet in self.snippets)
+
+    # Read API, mirroring app.crud
+
+    def get_languages(self) -> list[FileLanguage]:
+        return list(self.languages)
+
+    def get_language_by_slug(self, slug: str) -> FileLanguage | None:
+        return self._languages_by_slug.get(slug)
+
+    # Sparse fieldsets need no pushdown in memory, so fields is ignored
+
+    def get_operations(
+        self,
+        category: str | None = None,
+        complexity: Complexity | None = None,
+        fields: Fields | None = None
+    ) -> list[FileOperation]:
+        operations = [
+            op for op in self.operations
+            if (not category or op.category == category)
+            and (not complexity or op.complexity == complexity)
+        ]
+        return sorted(operations, key=lambda op: (op.category, op.name))
+
+    def get_operation_by_slug(self, slug: str) -> FileOperation | None:
+        return self._operations_by_slug.get(slug)
+
+    def get_related_operations(self, operation: FileOperation) -> list[dict]:
+        return [
+            {"operation": self._operations_by_slug[slug], "score": score}
+            for slug, score in self.related_slugs.get(operation.slug, [])
+        ]
+
+    def get_categories(self) -> list[dict]:
+        return [
+            {"name": row["name"], "slug": row["slug"], "operation_count": row["operation_count"]}
+            for row in self._facets["categories"]
+        ]
+
+    def get_facets(self) -> dict:
+        return self._facets
+
+    def get_method_titles(self) -> list[tuple[str, str, str, str]]:
+        return sorted(
+            (s.operation.slug, s.language.slug, s.method, s.method_title)
+            for s in self.snippets
+            if s.method_title is not None
+        )
+
+    def get_snippets(
+        self,
+        language_slugs: list[str],
+        operation_slug: str | None = None,
+        fields: Fields | None = None
+    ) -> list[FileSnippet]:
+        snippets = [
+            snippet
+            for slug in set(language_slugs)
+            for snippet in self._snippets_by_language.get(slug, [])
+            if not operation_slug or snippet.operation.slug == operation_slug
+        ]
+        return sorted(snippets, key=lambda s: s.id)
+
+    def get_snippets_for_comparison(
+        self,
+        language_slugs: list[str],
+        operation_slug: str,
+        fields: Fields | None = None
+    ) -> dict | None:
+        operation = self.get_operation_by_slug(operation_slug)
+        if not operation:
+            return None
+
+        snippets = {}
+        for lang_slug in language_slugs:
+            matches = self._snippets_by_pair.get((operation_slug, lang_slug))
+            snippets[lang_slug] = matches[0] if matches else None
+
+        return {"operation": operation, "snippets": snippets}
+
+    def get_blob(self, content_hash: str) -> FileBlob | None:
+        return self._blobs.get(content_hash)
+
+    def get_compression_dictionary(self, dictionary_id: str) -> bytes | None:
+        return None
+
+    def get_changes(self, since: int, limit: int) -> None:
+        # Indexed from the tree as a whole, so there is no change log
+        return None
+
+    def get_matrix(self, include_code: bool = False) -> dict:
+        rows = self._matrix_rows if include_code else [row[:5] for row in self._matrix_rows]
+        return build_matrix(rows, include_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a catalog index file from the snippets tree")
+    parser.add_argument("--snippets-dir", type=Path, default=SNIPPETS_DIR, help="Snippets directory")
+    parser.add_argument("--output", "-o", type=Path, required=True, help="Index file to write")
+    parser.add_argument("--validate", action="store_true", help="Syntax-check snippets and store the results")
+    args = parser.parse_args()
+
+    catalog = FileCatalog.from_tree(args.snippets_dir)
+    if args.validate:
+        counts = catalog.validate()
+        print(f"Checked {len(catalog.snippets)} snippets: {validation.format_counts(counts)}")
+    args.output.write_text(json.dumps(catalog.to_index(), separators=(",", ":")), encoding="utf-8")
+    print(f"Wrote {args.output}: {len(catalog.operations)} operations, {len(catalog.snippets)} snippets")
+
+
+if __name__ == "__main__":
+    main()
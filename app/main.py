@@ -1,34 +1,40 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+"""
+Application factory.
 
-from . import models, crud, schemas
-from .database import engine, get_db
-from .routers import languages, operations, snippets
-from fastapi import Depends
-from sqlalchemy.orm import Session
+Run with `uvicorn app.main:create_app --factory`. Importing this module is
+cheap: FastAPI routers, SQLAlchemy models and the database engine are only
+loaded when the app is created, and the engine is connected from the app
+lifespan. `app.main:app` is still available and builds the app on first
+access.
 
-models.Base.metadata.create_all(bind=engine)
+The API never creates or alters tables; see app/schema.py.
+"""
 
-app = FastAPI(
-    title="Codemon API",
-    description="API for code snippets learning - compare boilerplate code across programming languages",
-    version="1.0.0"
-)
+import asyncio
+from contextlib import asynccontextmanager
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
 
-app.include_router(languages.router)
-app.include_router(operations.router)
-app.include_router(snippets.router)
+from . import warmup
 
+router = APIRouter()
 
-@app.get("/")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from . import database, events
+
+    await asyncio.to_thread(database.init_storage)
+    # Warm up in the background so /healthz answers while /readyz is still failing
+    warmup_task = asyncio.create_task(warmup.warm_up(app))
+    yield
+    warmup_task.cancel()
+    await events.broadcaster.stop()
+    database.dispose_engine()
+
+
+@router.get("/")
 def root():
     return {
         "message": "Welcome to Codemon API",
@@ -37,12 +43,76 @@ def root():
             "languages": "/api/languages",
             "operations": "/api/operations",
             "snippets": "/api/snippets",
-            "categories": "/api/categories"
+            "matrix": "/api/matrix",
+            "categories": "/api/categories",
+            "facets": "/api/facets",
+            "suggest": "/api/suggest",
+            "changes": "/api/changes"
         }
     }
 
 
-@app.get("/api/categories", response_model=list[schemas.Category], tags=["categories"])
-def list_categories(db: Session = Depends(get_db)):
-    """Get all operation categories with their counts."""
-    return crud.get_categories(db)
+@router.get("/healthz", include_in_schema=False)
+def healthz():
+    """Liveness probe. Does no I/O."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz", include_in_schema=False)
+def readyz():
+    """Readiness probe. Fails until the startup warmup has completed."""
+    if not warmup.state.ready:
+        return JSONResponse(
+            {"status": "warming up", "attempts": warmup.state.attempts, "error": warmup.state.last_error},
+            status_code=503,
+        )
+    return {"status": "ready"}
+
+
+def create_app() -> FastAPI:
+    from fastapi.middleware.cors import CORSMiddleware
+
+    from .admission import AdmissionControlMiddleware, AdmissionSettings
+    from .compression import DICTIONARY_HEADER
+    from .routers import blobs, categories, changes, languages, operations, snippets, matrix, suggest
+
+    app = FastAPI(
+        title="Codemon API",
+        description="API for code snippets learning - compare boilerplate code across programming languages",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Added before CORS so that shed responses still carry CORS headers. The
+    # middleware is only built on the first request, so settings are read
+    # here for bad values to fail at startup.
+    app.add_middleware(AdmissionControlMiddleware, settings=AdmissionSettings.from_env())
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[DICTIONARY_HEADER],
+    )
+
+    app.include_router(router)
+    app.include_router(languages.router)
+    app.include_router(operations.router)
+    app.include_router(snippets.router)
+    app.include_router(matrix.router)
+    app.include_router(categories.router)
+    app.include_router(blobs.router)
+    app.include_router(suggest.router)
+    app.include_router(changes.router)
+
+    return app
+
+
+def __getattr__(name: str):
+    # Backwards compatible `app.main:app`, built on first access
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Enum, Index, LargeBinary
+from sqlalchemy.orm import object_session, relationship
 import enum
 
 from .database import Base
@@ -25,6 +25,11 @@ class Language(Base):
 
 class Operation(Base):
     __tablename__ = "operations"
+    __table_args__ = (
+        # Filter by category or complexity and return rows already in (category, name) order
+        Index("ix_operations_category_name", "category", "name"),
+        Index("ix_operations_complexity_category_name", "complexity", "category", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -43,15 +48,120 @@ class Operation(Base):
 
 class Snippet(Base):
     __tablename__ = "snippets"
+    __table_args__ = (
+        # One snippet per method; also serves lookups by operation and by (operation, language)
+        Index("ux_snippets_operation_language_method", "operation_id", "language_id", "method", unique=True),
+        # Lookups by language, e.g. every snippet for the selected languages
+        Index("ix_snippets_language_operation", "language_id", "operation_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     language_id = Column(Integer, ForeignKey("languages.id"), nullable=False)
     operation_id = Column(Integer, ForeignKey("operations.id"), nullable=False)
     method = Column(String(100), nullable=False, default="basic")  # Method/variant name
     method_title = Column(String(200), nullable=True)  # Display title for the method
-    code = Column(Text, nullable=False)
-    explanation = Column(Text, nullable=True)
-    content_hash = Column(String(64), nullable=True)  # SHA-256 hash for change detection
+    # SHA-256 hash of code and explanation, used for change detection and as the blob key
+    content_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=False, index=True)
+    # Result of the syntax check (see app/validation.py); NULL until checked
+    validation_status = Column(String(16), nullable=True)
+    validation_message = Column(Text, nullable=True)
 
     language = relationship("Language", back_populates="snippets")
     operation = relationship("Operation", back_populates="snippets")
+    blob = relationship("Blob", lazy="joined", innerjoin=True)
+
+    @property
+    def code(self) -> str:
+        return self.blob.source
+
+    @property
+    def explanation(self) -> str | None:
+        return self.blob.explanation
+
+
+class Blob(Base):
+    """Snippet code and explanation, stored once per distinct content."""
+    __tablename__ = "blobs"
+
+    hash = Column(String(64), primary_key=True)  # Same value as Snippet.content_hash
+    code = Column(Text, nullable=True)  # NULL when stored compressed
+    code_compressed = Column(LargeBinary, nullable=True)  # Raw DEFLATE primed with the dictionary
+    dictionary_id = Column(String(16), ForeignKey("compression_dictionaries.id"), nullable=True)
+    explanation = Column(Text, nullable=True)
+
+    @property
+    def source(self) -> str:
+        """The code, decompressed on access when stored compressed."""
+        from . import compression
+
+        return compression.decode(object_session(self), self.code, self.code_compressed, self.dictionary_id)
+
+
+class CompressionDictionary(Base):
+    """Preset dictionary for compressing snippet code, see app/compression.py."""
+    __tablename__ = "compression_dictionaries"
+
+    id = Column(String(16), primary_key=True)  # Truncated SHA-256 of data
+    data = Column(LargeBinary, nullable=False)
+
+
+class SnippetCheck(Base):
+    """Cached syntax check result, kept across reseeds so unchanged content is not checked again."""
+    __tablename__ = "snippet_checks"
+
+    content_hash = Column(String(64), primary_key=True)
+    language = Column(String(50), primary_key=True)  # Language slug
+    checker = Column(String(50), primary_key=True)  # Checker and toolchain version
+    status = Column(String(16), nullable=False)
+    message = Column(Text, nullable=True)
+
+
+class RelatedOperation(Base):
+    """Precomputed nearest neighbours of an operation, rebuilt at sync time."""
+    __tablename__ = "related_operations"
+
+    operation_id = Column(Integer, ForeignKey("operations.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 = most similar
+    related_operation_id = Column(Integer, ForeignKey("operations.id"), nullable=False)
+    score = Column(Float, nullable=False)  # Cosine similarity
+
+    related_operation = relationship("Operation", foreign_keys=[related_operation_id])
+
+
+class FacetCount(Base):
+    """Materialized operation/snippet counts per category, complexity and language."""
+    __tablename__ = "facet_counts"
+
+    facet = Column(String(20), primary_key=True)  # category | complexity | language
+    value = Column(String(100), primary_key=True)  # Category slug, complexity value or language slug
+    name = Column(String(100), nullable=False)  # Display name
+    operation_count = Column(Integer, nullable=False, default=0)
+    snippet_count = Column(Integer, nullable=False, default=0)
+
+
+class CatalogState(Base):
+    """Single-row table tracking the catalog generation, bumped on every seed or changing sync."""
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+    # Highest change log seq whose tombstone was compacted away (see app/changes.py)
+    changes_floor = Column(Integer, nullable=True)
+
+
+class Change(Base):
+    """Latest change to one catalog key, see app/changes.py."""
+    __tablename__ = "changes"
+    # Sequence numbers are never reused, even once the highest one is compacted away
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(320), unique=True, nullable=False)  # e.g. snippet/read-file/python/basic
+    generation = Column(Integer, nullable=False, index=True)  # Catalog generation it was committed in
+    kind = Column(String(16), nullable=False)  # snippet | operation | language
+    action = Column(String(16), nullable=False)  # upsert | delete
+    item_id = Column(Integer, nullable=True)  # Row id of the upserted item
+    operation = Column(String(100), nullable=True)  # Operation slug
+    language = Column(String(50), nullable=True)  # Language slug
+    method = Column(String(100), nullable=True)
+    content_hash = Column(String(64), nullable=True)
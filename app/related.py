@@ -0,0 +1,312 @@
+"""
+Related-operations similarity index.
+
+Each operation is turned into a TF-IDF weighted bag of tokens taken from its
+name, description, snippet explanations and snippet code. Cosine similarity
+between every pair of operations is computed once at sync time and the top-k
+neighbours of each operation are stored in the related_operations table, so
+the API only performs an indexed lookup per request.
+
+Before scoring, terms are mapped to indexes in a vocabulary of the
+MAX_VOCABULARY terms found in the most documents, each document keeps its
+MAX_TERMS_PER_DOC strongest terms and each term its MAX_POSTINGS_PER_TERM
+strongest documents, and the vectors are normalized again. This bounds the
+work per document, so the build stays linear in the number of operations;
+none of the caps bind on a catalog of a few hundred operations.
+
+The pruned vectors are then scored exactly, through an inverted index: with
+NumPy, a block of documents at a time, summing the products of its postings
+per pair of documents and sorting the pairs once; without it, in pure Python. Both rank neighbours by score,
+rounded to SCORE_DIGITS, then by document index, so they return the same
+neighbours.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from heapq import nlargest
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from . import compression, models
+
+# Number of neighbours stored per operation
+DEFAULT_TOP_K = 5
+
+# Relative weight of each source of tokens
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "description": 2.0,
+    "explanation": 1.5,
+    "code": 1.0,
+}
+
+# Terms scored, by document frequency
+MAX_VOCABULARY = 50_000
+
+# Strongest terms kept per document, and strongest documents kept per term
+MAX_TERMS_PER_DOC = 128
+MAX_POSTINGS_PER_TERM = 64
+
+# Scores are compared at this precision, so float summation order never
+# changes the ranking
+SCORE_DIGITS = 9
+
+# Upper bound on the document-posting products the NumPy path generates at once
+MAX_BLOCK_CELLS = 8_000_000
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z0-9]+|[A-Z]+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Split text into lowercase word tokens, breaking up camelCase identifiers."""
+    if not text:
+        return []
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text):
+        for part in CAMEL_CASE_PATTERN.findall(word):
+            if len(part) > 1:
+                tokens.append(part.lower())
+    return tokens
+
+
+def add_text(doc: Counter, field: str, text: str | None) -> None:
+    """Add the tokens of text to a document with the weight of its field."""
+    weight = FIELD_WEIGHTS[field]
+    for token in tokenize(text):
+        doc[token] += weight
+
+
+def collect_documents(db: Session) -> tuple[list[int], list[Counter]]:
+    """
+    Build a weighted term-count document for every operation.
+    Returns (operation_ids, documents) in matching order.
+    """
+    documents: dict[int, Counter] = {}
+    for op_id, name, description in db.query(
+        models.Operation.id, models.Operation.name, models.Operation.description
+    ).order_by(models.Operation.id):
+        doc = Counter()
+        add_text(doc, "name", name)
+        add_text(doc, "description", description)
+        documents[op_id] = doc
+
+    snippet_rows = (
+        db.query(
+            models.Snippet.operation_id,
+            models.Blob.explanation,
+            models.Blob.code,
+            models.Blob.code_compressed,
+            models.Blob.dictionary_id,
+        )
+        .join(models.Blob)
+        .yield_per(1000)
+    )
+    for op_id, explanation, *stored_code in snippet_rows:
+        doc = documents.get(op_id)
+        if doc is None:
+            continue
+        add_text(doc, "explanation", explanation)
+        add_text(doc, "code", compression.decode(db, *stored_code))
+
+    return list(documents), list(documents.values())
+
+
+def tfidf_vectors(documents: list[Counter]) -> list[dict[str, float]]:
+    """Convert weighted term counts to L2-normalized TF-IDF vectors."""
+    doc_freq = Counter()
+    for doc in documents:
+        doc_freq.update(doc.keys())
+
+    n_docs = len(documents)
+    vectors = []
+    for doc in documents:
+        vector = {
+            term: math.log1p(count) * (math.log((1 + n_docs) / (1 + doc_freq[term])) + 1)
+            for term, count in doc.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm:
+            vector = {term: w / norm for term, w in vector.items()}
+        vectors.append(vector)
+    return vectors
+
+
+def prune_vectors(vectors: list[dict[str, float]]) -> tuple[list[list[tuple[int, float]]], int]:
+    """
+    Map terms to vocabulary indexes and apply the MAX_* caps. Returns, per
+    document, its (term index, weight) pairs normalized again, and the
+    vocabulary size.
+    """
+    doc_freq = Counter()
+    for vector in vectors:
+        doc_freq.update(vector.keys())
+    ranked = sorted(doc_freq, key=lambda term: (-doc_freq[term], term))[:MAX_VOCABULARY]
+    vocabulary = {term: index for index, term in enumerate(ranked)}
+
+    docs = []
+    for vector in vectors:
+        terms = [(vocabulary[term], w) for term, w in vector.items() if term in vocabulary]
+        if len(terms) > MAX_TERMS_PER_DOC:
+            terms = nlargest(MAX_TERMS_PER_DOC, terms, key=lambda item: (item[1], -item[0]))
+        docs.append(terms)
+
+    postings: dict[int, list[tuple[float, int]]] = defaultdict(list)
+    for doc_id, terms in enumerate(docs):
+        for term, weight in terms:
+            postings[term].append((weight, -doc_id))
+    dropped = set()
+    for term, docs_of_term in postings.items():
+        if len(docs_of_term) > MAX_POSTINGS_PER_TERM:
+            docs_of_term.sort(reverse=True)
+            dropped.update((term, -doc_id) for _, doc_id in docs_of_term[MAX_POSTINGS_PER_TERM:])
+
+    pruned = []
+    for doc_id, terms in enumerate(docs):
+        if dropped:
+            terms = [(term, w) for term, w in terms if (term, doc_id) not in dropped]
+        norm = math.sqrt(sum(w * w for _, w in terms))
+        pruned.append(sorted((term, w / norm) for term, w in terms) if norm else [])
+    return pruned, len(vocabulary)
+
+
+def rank(scores, top_k: int) -> list[tuple[int, float]]:
+    """The top_k (document index, score) pairs with a positive score, best first."""
+    rounded = ((doc_id, round(score, SCORE_DIGITS)) for doc_id, score in scores)
+    return nlargest(
+        top_k,
+        ((doc_id, score) for doc_id, score in rounded if score > 0),
+        key=lambda item: (item[1], -item[0]),
+    )
+
+
+def _top_k_numpy(docs: list[list[tuple[int, float]]], n_terms: int, top_k: int) -> list[list[tuple[int, float]]]:
+    """
+    Exact top-k over the pruned vectors: every (document, posting) product of
+    a block of documents is generated at once, products of the same pair are
+    summed, and pairs are sorted by document, score and neighbour.
+    """
+    import numpy as np
+
+    n_docs = len(docs)
+    lengths = np.array([len(terms) for terms in docs], dtype=np.int64)
+    doc_ptr = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(lengths, out=doc_ptr[1:])
+    doc_terms = np.array([term for terms in docs for term, _ in terms], dtype=np.int64)
+    doc_weights = np.array([w for terms in docs for _, w in terms], dtype=np.float64)
+    doc_of_entry = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+
+    # Inverted index: the entries of each term, grouped by term
+    order = np.argsort(doc_terms, kind="stable")
+    term_docs = doc_of_entry[order]
+    term_weights = doc_weights[order]
+    term_ptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(doc_terms, minlength=n_terms), out=term_ptr[1:])
+    # Products generated per document
+    pair_counts = np.add.reduceat(
+        np.append(term_ptr[doc_terms + 1] - term_ptr[doc_terms], 0), doc_ptr[:-1]
+    ) * (lengths > 0)
+
+    neighbours = [[] for _ in range(n_docs)]
+    start = 0
+    while start < n_docs:
+        # As many documents as fit MAX_BLOCK_CELLS products, at least one
+        stop = max(start + 1, int(np.searchsorted(
+            np.cumsum(pair_counts[start:]), MAX_BLOCK_CELLS, side="right"
+        )) + start)
+        entries = slice(doc_ptr[start], doc_ptr[stop])
+        terms = doc_terms[entries]
+        counts = term_ptr[terms + 1] - term_ptr[terms]
+        rows = np.repeat(doc_of_entry[entries], counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        postings = np.repeat(term_ptr[terms], counts) + offsets
+        products = np.repeat(doc_weights[entries], counts) * term_weights[postings]
+        start = stop
+        if not len(products):
+            continue
+
+        keys = rows * n_docs + term_docs[postings]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        scores = np.round(np.add.reduceat(products[order], first), SCORE_DIGITS)
+        pair_rows, pair_cols = np.divmod(keys[first], n_docs)
+        # Never report an operation as related to itself
+        keep = (scores > 0) & (pair_rows != pair_cols)
+        pair_rows, pair_cols, scores = pair_rows[keep], pair_cols[keep], scores[keep]
+
+        # Pairs are already ordered by document then neighbour; a stable sort
+        # on (document, descending score) keeps that order among equal scores
+        units = np.rint(scores * 10 ** SCORE_DIGITS).astype(np.int64)
+        order = np.argsort(pair_rows * 2 ** 32 - units, kind="stable")
+        pair_rows, pair_cols, scores = pair_rows[order], pair_cols[order], scores[order]
+        row_start = np.flatnonzero(np.r_[True, pair_rows[1:] != pair_rows[:-1]])
+        positions = np.arange(len(pair_rows)) - np.repeat(row_start, np.diff(np.r_[row_start, len(pair_rows)]))
+        top = positions < top_k
+        for row, col, score in zip(pair_rows[top].tolist(), pair_cols[top].tolist(), scores[top].tolist()):
+            neighbours[row].append((col, score))
+    return neighbours
+
+
+def _top_k_python(docs: list[list[tuple[int, float]]], top_k: int) -> list[list[tuple[int, float]]]:
+    """Exact top-k over the pruned vectors through an inverted index."""
+    postings: dict[int, list[tuple[int, float]]] = defaultdict(list)
+    for doc_id, terms in enumerate(docs):
+        for term, weight in terms:
+            postings[term].append((doc_id, weight))
+
+    neighbours = []
+    for doc_id, terms in enumerate(docs):
+        scores: dict[int, float] = {}
+        get = scores.get
+        for term, weight in terms:
+            for other_id, other_weight in postings[term]:
+                scores[other_id] = get(other_id, 0.0) + weight * other_weight
+        scores.pop(doc_id, None)
+        neighbours.append(rank(scores.items(), top_k))
+    return neighbours
+
+
+def compute_neighbours(
+    vectors: list[dict[str, float]],
+    top_k: int = DEFAULT_TOP_K
+) -> list[list[tuple[int, float]]]:
+    """
+    Compute the top-k most similar documents for every document.
+    Returns, per document, a list of (document_index, score) sorted by score.
+    """
+    if len(vectors) < 2 or top_k < 1:
+        return [[] for _ in vectors]
+    docs, n_terms = prune_vectors(vectors)
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return _top_k_python(docs, top_k)
+    return _top_k_numpy(docs, n_terms, top_k)
+
+
+def build_related_index(db: Session, top_k: int = DEFAULT_TOP_K) -> int:
+    """
+    Rebuild the related_operations table from the current catalog.
+    Does not commit. Returns the number of rows written.
+    """
+    operation_ids, documents = collect_documents(db)
+    neighbours = compute_neighbours(tfidf_vectors(documents), top_k)
+
+    rows = [
+        {
+            "operation_id": operation_ids[doc_id],
+            "related_operation_id": operation_ids[other_id],
+            "rank": rank,
+            "score": round(float(score), 6),
+        }
+        for doc_id, doc_neighbours in enumerate(neighbours)
+        for rank, (other_id, score) in enumerate(doc_neighbours)
+    ]
+
+    db.execute(delete(models.RelatedOperation))
+    if rows:
+        db.execute(insert(models.RelatedOperation), rows)
+    return len(rows)
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from .. import compression, crud, schemas
+from ..database import get_db
+from ..serialization import Encoder, JSONBytesResponse
+
+router = APIRouter(prefix="/api/blobs", tags=["blobs"])
+
+# Blobs and dictionaries are addressed by a hash of their content, so the
+# response for a URL can never change
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def immutable_headers(request: Request, etag: str) -> dict | None:
+    """Caching headers for content that never changes, or None if the client already has it."""
+    if request.headers.get("if-none-match") == etag:
+        return None
+    return {"Cache-Control": IMMUTABLE, "ETag": etag}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"Cache-Control": IMMUTABLE, "ETag": etag})
+
+
+@router.get("/dictionaries/{dictionary_id}", response_class=Response)
+def get_dictionary(dictionary_id: str, request: Request, db: Session = Depends(get_db)):
+    """Get a compression dictionary, needed to decode x-zdict responses."""
+    # Looked up first: a 304 would let clients cache an id that does not exist
+    data = crud.get_compression_dictionary(db, dictionary_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Dictionary not found")
+    etag = f'"{dictionary_id}"'
+    headers = immutable_headers(request, etag)
+    if headers is None:
+        return not_modified(etag)
+    return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/{content_hash}", response_model=schemas.Blob)
+def get_blob(content_hash: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Get the code and explanation stored under a snippet's content_hash.
+
+    The content of a hash never changes, so responses may be cached forever;
+    listings with content=ref only return hashes to fetch here.
+    """
+    blob = crud.get_blob(db, content_hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    etag = f'"{content_hash}"'
+    headers = immutable_headers(request, etag)
+    if headers is None:
+        return not_modified(etag)
+    return JSONBytesResponse(Encoder().blob(blob), headers=headers)
+
+
+@router.get("/{content_hash}/code", response_class=PlainTextResponse)
+def get_blob_code(content_hash: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Get the code stored under a snippet's content_hash, as plain text.
+
+    Clients sending `Accept-Encoding: x-zdict` receive compressed code exactly
+    as stored, with `Content-Encoding: x-zdict` and the dictionary id in the
+    X-Compression-Dictionary header. The body is raw DEFLATE primed with that
+    dictionary (zlib.decompressobj(-15, zdict=dictionary) in Python).
+    """
+    blob = crud.get_blob(db, content_hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": IMMUTABLE}
+    if blob.dictionary_id is not None and compression.accepts(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = compression.CONTENT_ENCODING
+        headers[compression.DICTIONARY_HEADER] = blob.dictionary_id
+        return Response(content=blob.code_compressed, media_type="text/plain; charset=utf-8", headers=headers)
+    return PlainTextResponse(blob.source, headers=headers)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..database import get_db
+from ..serialization import JSONBytesResponse
+
+router = APIRouter(prefix="/api", tags=["categories"])
+
+
+@router.get("/categories", response_model=list[schemas.Category])
+def list_categories(db: Session = Depends(get_db)):
+    """Get all operation categories with their counts."""
+    return JSONBytesResponse(crud.get_categories(db))
+
+
+@router.get("/facets", response_model=schemas.Facets)
+def list_facets(db: Session = Depends(get_db)):
+    """Get operation and snippet counts per category, complexity and language."""
+    return JSONBytesResponse(crud.get_facets(db))
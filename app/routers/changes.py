@@ -0,0 +1,74 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .. import crud, events, schemas
+from ..database import get_db
+from ..serialization import JSONBytesResponse, encode_changes
+
+router = APIRouter(prefix="/api/changes", tags=["changes"])
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+@router.get("", response_model=schemas.ChangeFeed)
+def list_changes(
+    since: int = Query(0, ge=0, description="Highest seq already applied"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    """
+    Get what seeds and syncs changed after a position in the change log.
+
+    Each key (a snippet's operation/language/method, an operation or a
+    language) appears once, for its latest change, with its current state
+    under **item**; snippet content is at /api/blobs/{content_hash}. Apply
+    the changes in order, then call again with since set to **next** while
+    **more** is true.
+
+    To start a mirror, note **latest** from `?since=0&limit=1`, copy the
+    catalog, then follow the log from there. Responds with 410 when since is
+    too old to catch up from (deletes may have been forgotten), after which
+    the catalog has to be copied again.
+    """
+    feed = crud.get_changes(db, since, limit)
+    if feed is None:
+        raise HTTPException(status_code=410, detail="This catalog keeps no change log; copy it in full")
+    if since < feed["floor"] or since > feed["latest"]:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Changes after {since} are not available; copy the catalog and continue from {feed['latest']}",
+        )
+    return JSONBytesResponse(encode_changes(since, feed))
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_changes(
+    request: Request,
+    since: int | None = Query(None, ge=0, description="Also send the changes after this seq"),
+    last_event_id: int | None = Header(None, ge=0),
+):
+    """
+    Server-sent events for every change a seed or sync commits, as soon as
+    the API notices it (within about a second).
+
+    Each `change` event has the fields of a /api/changes entry without its
+    item, and its seq as event id. EventSource reconnects by itself, sending
+    the last id it received, and the changes it missed are sent first. A
+    `reset` event means changes were lost or are too many to replay: reload
+    the catalog. Streams are
+    closed after 25 seconds, and clients too slow to keep up are
+    disconnected; both just reconnect.
+    """
+    # No database session is held by the stream itself
+    if not await asyncio.to_thread(events.has_change_log):
+        raise HTTPException(status_code=410, detail="This catalog keeps no change log")
+    start = last_event_id if last_event_id is not None else since
+    return StreamingResponse(
+        events.stream(start, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 
 from .. import crud, schemas
 from ..database import get_db
+from ..serialization import Encoder, JSONBytesResponse, encode_languages
 
 router = APIRouter(prefix="/api/languages", tags=["languages"])
 
@@ -10,7 +11,7 @@ router = APIRouter(prefix="/api/languages", tags=["languages"])
 @router.get("", response_model=list[schemas.Language])
 def list_languages(db: Session = Depends(get_db)):
     """Get all available programming languages."""
-    return crud.get_languages(db)
+    return JSONBytesResponse(encode_languages(crud.get_languages(db)))
 
 
 @router.get("/{slug}", response_model=schemas.Language)
@@ -19,4 +20,4 @@ def get_language(slug: str, db: Session = Depends(get_db)):
     language = crud.get_language_by_slug(db, slug)
     if not language:
         raise HTTPException(status_code=404, detail="Language not found")
-    return language
+    return JSONBytesResponse(Encoder().language(language))
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..catalog import GenerationCache, get_generation
+from ..database import get_db
+from ..serialization import JSONBytesResponse, dumps
+
+router = APIRouter(prefix="/api/matrix", tags=["matrix"])
+
+# Encoded responses, reused until the catalog generation changes
+matrix_cache = GenerationCache()
+
+
+@router.get("", response_model=schemas.Matrix)
+def get_matrix(
+    request: Request,
+    code: bool = Query(False, description="Include code and explanation for every snippet"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the full operation x language x method availability grid in one response.
+
+    Slugs, method names and titles are listed once in string tables; each
+    snippet is a position in the parallel arrays under **snippets**, holding
+    indexes into those tables.
+    """
+    generation = get_generation(db)
+    etag = f'"matrix-{generation}-{int(code)}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    def build() -> bytes:
+        matrix = {"generation": generation, **crud.get_matrix(db, include_code=code)}
+        return dumps(matrix)
+
+    content = matrix_cache.get_or_build(generation, code, build)
+    return JSONBytesResponse(content, headers={"ETag": etag})
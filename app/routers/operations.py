@@ -1,21 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
+from .. import crud, fields as fieldsets, schemas
 from ..database import get_db
 from ..models import Complexity
+from ..serialization import (
+    Encoder,
+    JSONBytesResponse,
+    encode_operations,
+    encode_projection,
+    encode_related_operations,
+)
 
 router = APIRouter(prefix="/api/operations", tags=["operations"])
 
 
-@router.get("", response_model=list[schemas.Operation])
+@router.get("", response_model=list[schemas.Operation] | list[schemas.OperationProjection])
 def list_operations(
     category: str | None = None,
     complexity: Complexity | None = None,
+    fields: str | None = Query(None, description=fieldsets.describe(fieldsets.OPERATION)),
     db: Session = Depends(get_db)
 ):
-    """Get all operations, optionally filtered by category and/or complexity."""
-    return crud.get_operations(db, category, complexity)
+    """
+    Get all operations, optionally filtered by category and/or complexity.
+
+    - **fields**: Only return these fields of each operation, e.g. "slug,name"
+    """
+    selected = fieldsets.parse_fields(fields, fieldsets.OPERATION)
+    operations = crud.get_operations(db, category, complexity, fields=selected)
+    if selected is not None:
+        return JSONBytesResponse(encode_projection(operations, selected))
+    return JSONBytesResponse(encode_operations(operations))
 
 
 @router.get("/{slug}", response_model=schemas.Operation)
@@ -24,4 +40,13 @@ def get_operation(slug: str, db: Session = Depends(get_db)):
     operation = crud.get_operation_by_slug(db, slug)
     if not operation:
         raise HTTPException(status_code=404, detail="Operation not found")
-    return operation
+    return JSONBytesResponse(Encoder().operation(operation))
+
+
+@router.get("/{slug}/related", response_model=list[schemas.RelatedOperation])
+def get_related_operations(slug: str, db: Session = Depends(get_db)):
+    """Get the operations most similar to the given one, best match first."""
+    operation = crud.get_operation_by_slug(db, slug)
+    if not operation:
+        raise HTTPException(status_code=404, detail="Operation not found")
+    return JSONBytesResponse(encode_related_operations(crud.get_related_operations(db, operation)))
@@ -1,13 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
+from .. import crud, fields as fieldsets, schemas
+from ..blobs import shared_blobs
 from ..database import get_db
+from ..serialization import (
+    JSONBytesResponse,
+    encode_comparison,
+    encode_comparison_projection,
+    encode_projection,
+    encode_ref_comparison,
+    encode_ref_snippets,
+    encode_shared_comparison,
+    encode_shared_snippets,
+    encode_snippets,
+)
+from ..singleflight import SingleFlight, SingleFlightTimeout
 
 router = APIRouter(prefix="/api/snippets", tags=["snippets"])
 
 MAX_LANGUAGES = 3
 
+# Seconds a request waits for an identical in-flight request before giving up
+COALESCE_TIMEOUT = 10.0
+
+# Identical concurrent requests share one database query and serialization
+flights = SingleFlight()
+
 
 def parse_languages(languages: str) -> list[str]:
     """Parse comma-separated language slugs and validate count."""
@@ -22,10 +41,49 @@ def parse_languages(languages: str) -> list[str]:
     return lang_list
 
 
-@router.get("", response_model=list[schemas.SnippetWithDetails])
+def parse_fields(fields: str | None, available: dict, content: schemas.ContentMode) -> fieldsets.Fields | None:
+    selected = fieldsets.parse_fields(fields, available)
+    if selected is not None and content != schemas.ContentMode.INLINE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"fields cannot be combined with content={content.value}; select content_hash instead"
+        )
+    return selected
+
+
+def coalesce(key: tuple, fn):
+    """Run fn once for all concurrent requests with the same key."""
+    try:
+        return flights.do(key, fn, timeout=COALESCE_TIMEOUT)
+    except SingleFlightTimeout:
+        raise HTTPException(
+            status_code=503,
+            detail="Timed out waiting for an identical request",
+            headers={"Retry-After": "1"},
+        )
+
+
+CONTENT_DESCRIPTION = (
+    "inline: code in every snippet; "
+    "shared: each distinct content once, in a blobs map keyed by content_hash; "
+    "ref: content_hash only, content from the cacheable /api/blobs/{content_hash}"
+)
+
+
+@router.get(
+    "",
+    response_model=(
+        list[schemas.SnippetWithDetails]
+        | schemas.SharedSnippetList
+        | list[schemas.SnippetWithDetailsRef]
+        | list[schemas.SnippetProjection]
+    )
+)
 def get_snippets(
     languages: str = Query(..., description="Comma-separated language slugs (max 3)"),
     operation: str | None = Query(None, description="Operation slug to filter by"),
+    content: schemas.ContentMode = Query(schemas.ContentMode.INLINE, description=CONTENT_DESCRIPTION),
+    fields: str | None = Query(None, description=fieldsets.describe(fieldsets.SNIPPET)),
     db: Session = Depends(get_db)
 ):
     """
@@ -33,25 +91,70 @@ def get_snippets(
 
     - **languages**: Comma-separated list of language slugs (e.g., "python,javascript,java")
     - **operation**: Optional operation slug to filter snippets
+    - **content**: With "shared", identical code is sent once per response;
+      with "ref", it is not sent at all and each content_hash is fetched once
+      from /api/blobs, which can be cached forever
+    - **fields**: Only return these fields of each snippet, e.g.
+      "id,method_title,language.slug,operation.slug" for a menu without code
     """
     lang_list = parse_languages(languages)
-    snippets = crud.get_snippets(db, lang_list, operation)
-    return snippets
+    selected = parse_fields(fields, fieldsets.SNIPPET, content)
 
+    # The result is shared with other threads, so it is detached from this
+    # request's session by encoding it up front
+    def load() -> bytes:
+        if content == schemas.ContentMode.REF:
+            return encode_ref_snippets(crud.get_snippets(db, lang_list, operation, fields=fieldsets.SNIPPET_REF))
+        snippets = crud.get_snippets(db, lang_list, operation, fields=selected)
+        if selected is not None:
+            return encode_projection(snippets, selected)
+        if content == schemas.ContentMode.SHARED:
+            return encode_shared_snippets(snippets, shared_blobs(snippets))
+        return encode_snippets(snippets)
 
-@router.get("/compare", response_model=schemas.SnippetComparison)
+    key = ("snippets", tuple(lang_list), operation, content, fieldsets.key(selected))
+    return JSONBytesResponse(coalesce(key, load))
+
+
+@router.get(
+    "/compare",
+    response_model=(
+        schemas.SnippetComparison
+        | schemas.SharedSnippetComparison
+        | schemas.SnippetRefComparison
+        | schemas.SnippetProjectionComparison
+    )
+)
 def compare_snippets(
     languages: str = Query(..., description="Comma-separated language slugs (max 3)"),
     operation: str = Query(..., description="Operation slug to compare"),
+    content: schemas.ContentMode = Query(schemas.ContentMode.INLINE, description=CONTENT_DESCRIPTION),
+    fields: str | None = Query(None, description=fieldsets.describe(fieldsets.COMPARED_SNIPPET)),
     db: Session = Depends(get_db)
 ):
     """
     Compare code snippets across languages for a specific operation.
 
-    Returns snippets side-by-side for easy comparison.
+    Returns snippets side-by-side for easy comparison. **fields** selects
+    which fields of each snippet are returned.
     """
     lang_list = parse_languages(languages)
-    result = crud.get_snippets_for_comparison(db, lang_list, operation)
+    selected = parse_fields(fields, fieldsets.COMPARED_SNIPPET, content)
+
+    def load() -> bytes | None:
+        if content == schemas.ContentMode.REF:
+            result = crud.get_snippets_for_comparison(db, lang_list, operation, fields=fieldsets.COMPARED_SNIPPET_REF)
+            return encode_ref_comparison(result) if result else None
+        result = crud.get_snippets_for_comparison(db, lang_list, operation, fields=selected)
+        if not result:
+            return None
+        if selected is not None:
+            return encode_comparison_projection(result, selected)
+        if content == schemas.ContentMode.SHARED:
+            return encode_shared_comparison(result, shared_blobs(result["snippets"].values()))
+        return encode_comparison(result)
+
+    result = coalesce(("compare", tuple(lang_list), operation, content, fieldsets.key(selected)), load)
     if not result:
         raise HTTPException(status_code=404, detail="Operation not found")
-    return result
+    return JSONBytesResponse(result)
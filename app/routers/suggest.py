@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import schemas
+from ..catalog import GenerationCache, get_generation
+from ..database import get_db
+from ..serialization import JSONBytesResponse, dumps
+from ..suggest import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, SuggestIndex
+
+router = APIRouter(prefix="/api/suggest", tags=["suggest"])
+
+# One index per catalog generation, shared by all requests
+index_cache = GenerationCache()
+
+
+@router.get("", response_model=list[schemas.Suggestion])
+def suggest(
+    q: str = Query(..., max_length=100, description="What has been typed so far"),
+    limit: int = Query(DEFAULT_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS),
+    db: Session = Depends(get_db)
+):
+    """
+    Autocomplete operations, categories, languages and method titles.
+
+    Any word of a name can be typed from its start, and small typos are
+    forgiven; **edits** counts the corrections made. Exact matches come
+    first, then operations before languages, categories and method titles.
+    """
+    index = index_cache.get_or_build(get_generation(db), "index", lambda: SuggestIndex.build(db))
+    return JSONBytesResponse(dumps(index.suggest(q, limit)))
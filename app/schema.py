@@ -0,0 +1,190 @@
+"""
+Database schema management.
+
+The API never runs DDL; the schema is created or upgraded explicitly, either
+by seed_data / sync_snippets or with:
+
+    python -m app.schema
+
+Upgrading creates missing tables and any nullable columns and indexes added
+to the models since the database file was created, and computes the facet
+aggregates of catalogs that predate them, so existing databases pick them up
+without a reseed.
+"""
+
+import argparse
+import hashlib
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from . import models
+from .catalog import bump_generation
+from .database import SQLALCHEMY_DATABASE_URL, get_engine
+from .facets import rebuild_facets
+
+
+class MigrationError(Exception):
+    """Raised when existing data prevents the schema from being upgraded."""
+
+
+def create_missing_indexes(engine: Engine) -> list[str]:
+    """Create indexes declared on the models but missing from the database. Returns their names."""
+    inspector = inspect(engine)
+    created = []
+    for table in models.Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=engine)
+            except IntegrityError as e:
+                raise MigrationError(
+                    f"Cannot create unique index {index.name} on {table.name}: duplicate rows exist. "
+                    "Remove the duplicates (or reseed with seed_data.py) and run the migration again."
+                ) from e
+            created.append(index.name)
+    return created
+
+
+def add_missing_columns(engine: Engine) -> list[str]:
+    """
+    Add nullable columns declared on the models but missing from existing
+    tables. Returns their names as table.column.
+    """
+    inspector = inspect(engine)
+    added = []
+    for table in models.Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable or column.foreign_keys:
+                continue
+            column_type = column.type.compile(engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def move_inline_content_to_blobs(engine: Engine) -> int:
+    """
+    Move code and explanation from the snippets table into the blobs table,
+    for databases created before content-addressed storage. Returns the
+    number of snippets migrated.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("snippets")}
+    if "code" not in columns:
+        return 0
+
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text("SELECT id, code, explanation, content_hash FROM snippets")
+        ).all()
+        for snippet_id, code, explanation, content_hash in rows:
+            if content_hash is None:
+                # Same format as snippet_tree.compute_hash
+                content = f"{code}|{explanation or ''}"
+                content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                connection.execute(
+                    text("UPDATE snippets SET content_hash = :hash WHERE id = :id"),
+                    {"hash": content_hash, "id": snippet_id},
+                )
+            connection.execute(
+                text(
+                    "INSERT OR IGNORE INTO blobs (hash, code, explanation) "
+                    "VALUES (:hash, :code, :explanation)"
+                ),
+                {"hash": content_hash, "code": code, "explanation": explanation},
+            )
+        connection.execute(text("ALTER TABLE snippets DROP COLUMN code"))
+        connection.execute(text("ALTER TABLE snippets DROP COLUMN explanation"))
+    return len(rows)
+
+
+def add_blob_compression_columns(engine: Engine) -> bool:
+    """
+    Add the compressed code columns to a blobs table created before code
+    compression, and make its code column nullable. Returns whether the table
+    was changed.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("blobs")}
+    if "dictionary_id" in columns:
+        return False
+
+    with engine.begin() as connection:
+        if engine.dialect.name != "sqlite":
+            connection.execute(text("ALTER TABLE blobs ALTER COLUMN code DROP NOT NULL"))
+            for column in (models.Blob.code_compressed, models.Blob.dictionary_id):
+                column_type = column.type.compile(engine.dialect)
+                connection.execute(text(f"ALTER TABLE blobs ADD COLUMN {column.key} {column_type}"))
+            return True
+
+        # SQLite cannot drop NOT NULL, so the table is rebuilt from the model
+        create = str(CreateTable(models.Blob.__table__).compile(engine))
+        connection.execute(text(create.replace("CREATE TABLE blobs", "CREATE TABLE blobs_new", 1)))
+        connection.execute(text(
+            "INSERT INTO blobs_new (hash, code, explanation) SELECT hash, code, explanation FROM blobs"
+        ))
+        connection.execute(text("DROP TABLE blobs"))
+        connection.execute(text("ALTER TABLE blobs_new RENAME TO blobs"))
+    return True
+
+
+def backfill_facets(engine: Engine) -> int:
+    """
+    Compute the facet aggregates of a catalog created before they existed,
+    which the category and facet routes read instead of counting. Bumps the
+    generation so caches built from the empty aggregates are dropped.
+    Returns the number of facet rows written.
+    """
+    with Session(engine) as db:
+        if db.query(models.FacetCount).first() is not None or db.query(models.Operation).first() is None:
+            return 0
+        written = rebuild_facets(db)
+        bump_generation(db)
+        db.commit()
+    return written
+
+
+def init_schema(engine: Engine | None = None) -> list[str]:
+    """
+    Create any missing tables and indexes and apply data migrations.
+    Safe to run against an existing database. Returns a description of
+    each change made to existing tables.
+    """
+    engine = engine or get_engine()
+    models.Base.metadata.create_all(bind=engine)
+
+    changes = []
+    migrated = move_inline_content_to_blobs(engine)
+    if migrated:
+        changes.append(f"Moved content of {migrated} snippets to blobs")
+    if add_blob_compression_columns(engine):
+        changes.append("Added compressed code columns to blobs")
+    changes += [f"Added column: {name}" for name in add_missing_columns(engine)]
+    changes += [f"Created index: {name}" for name in create_missing_indexes(engine)]
+    facets = backfill_facets(engine)
+    if facets:
+        changes.append(f"Computed {facets} facet counts")
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the database schema")
+    parser.parse_args()
+
+    try:
+        changes = init_schema()
+    except MigrationError as e:
+        raise SystemExit(f"Error: {e}")
+    for change in changes:
+        print(f"  + {change}")
+    print(f"Schema is up to date: {SQLALCHEMY_DATABASE_URL}")
+
+
+if __name__ == "__main__":
+    main()
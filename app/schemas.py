@@ -10,6 +10,14 @@ class Complexity(str, Enum):
     MULTITHREADING = "multithreading"
 
 
+class ValidationStatus(str, Enum):
+    """Result of the syntax check run on each snippet at sync time."""
+    VALID = "valid"
+    INVALID = "invalid"
+    TIMEOUT = "timeout"
+    UNCHECKED = "unchecked"  # No checker or toolchain for the language
+
+
 class LanguageBase(BaseModel):
     name: str
     slug: str
@@ -37,6 +45,11 @@ class Operation(OperationBase):
         from_attributes = True
 
 
+class RelatedOperation(BaseModel):
+    operation: Operation
+    score: float
+
+
 class SnippetBase(BaseModel):
     code: str
     explanation: str | None = None
@@ -46,6 +59,8 @@ class Snippet(SnippetBase):
     id: int
     language_id: int
     operation_id: int
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
 
     class Config:
         from_attributes = True
@@ -57,6 +72,8 @@ class SnippetWithDetails(BaseModel):
     explanation: str | None = None
     language: Language
     operation: Operation
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
 
     class Config:
         from_attributes = True
@@ -67,7 +84,203 @@ class SnippetComparison(BaseModel):
     snippets: dict[str, Snippet | None]  # language_slug -> snippet
 
 
+class ContentMode(str, Enum):
+    """How snippet code and explanations are returned."""
+    INLINE = "inline"  # Embedded in every snippet
+    SHARED = "shared"  # Once per distinct content_hash, in a separate blobs map
+    REF = "ref"  # Not included; fetched from /api/blobs/{content_hash}
+
+
+class Blob(BaseModel):
+    code: str
+    explanation: str | None = None
+
+
+class SnippetRef(BaseModel):
+    """Snippet whose code and explanation are looked up by content_hash."""
+    id: int
+    language_id: int
+    operation_id: int
+    content_hash: str
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class SnippetWithDetailsRef(BaseModel):
+    id: int
+    content_hash: str
+    language: Language
+    operation: Operation
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class SharedSnippetList(BaseModel):
+    snippets: list[SnippetWithDetailsRef]
+    blobs: dict[str, Blob]  # content_hash -> content
+
+
+class SharedSnippetComparison(BaseModel):
+    operation: Operation
+    snippets: dict[str, SnippetRef | None]  # language_slug -> snippet
+    blobs: dict[str, Blob]  # content_hash -> content
+
+
+class SnippetRefComparison(BaseModel):
+    operation: Operation
+    snippets: dict[str, SnippetRef | None]  # language_slug -> snippet
+
+
+class LanguageProjection(BaseModel):
+    """Language with only the fields selected by a fields parameter; the others are omitted."""
+    name: str | None = None
+    slug: str | None = None
+    id: int | None = None
+
+
+class OperationProjection(BaseModel):
+    """Operation with only the fields selected by a fields parameter; the others are omitted."""
+    name: str | None = None
+    slug: str | None = None
+    category: str | None = None
+    description: str | None = None
+    complexity: Complexity | None = None
+    id: int | None = None
+
+
+class SnippetProjection(BaseModel):
+    """Snippet with only the fields selected by a fields parameter; the others are omitted."""
+    id: int | None = None
+    code: str | None = None
+    explanation: str | None = None
+    content_hash: str | None = None
+    method: str | None = None
+    method_title: str | None = None
+    language: LanguageProjection | None = None
+    operation: OperationProjection | None = None
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
+
+
+class ComparedSnippetProjection(BaseModel):
+    """Compared snippet with only the fields selected by a fields parameter; the others are omitted."""
+    code: str | None = None
+    explanation: str | None = None
+    id: int | None = None
+    language_id: int | None = None
+    operation_id: int | None = None
+    content_hash: str | None = None
+    method: str | None = None
+    method_title: str | None = None
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
+
+
+class SnippetProjectionComparison(BaseModel):
+    operation: Operation
+    snippets: dict[str, ComparedSnippetProjection | None]  # language_slug -> snippet
+
+
 class Category(BaseModel):
     name: str
     slug: str
     operation_count: int
+
+
+class FacetValue(BaseModel):
+    name: str
+    slug: str
+    operation_count: int
+    snippet_count: int
+
+
+class Facets(BaseModel):
+    categories: list[FacetValue]
+    complexities: list[FacetValue]
+    languages: list[FacetValue]
+
+
+class MatrixSnippets(BaseModel):
+    """Parallel arrays, one entry per snippet. Integers index the Matrix string tables."""
+    id: list[int]
+    operation: list[int]
+    language: list[int]
+    method: list[int]
+    title: list[int | None]
+    code: list[str] | None = None
+    explanation: list[str | None] | None = None
+
+
+class Matrix(BaseModel):
+    generation: int
+    operations: list[str]
+    languages: list[str]
+    methods: list[str]
+    titles: list[str]
+    snippets: MatrixSnippets
+
+
+class SuggestionKind(str, Enum):
+    OPERATION = "operation"
+    CATEGORY = "category"
+    LANGUAGE = "language"
+    METHOD = "method"
+
+
+class Suggestion(BaseModel):
+    kind: SuggestionKind
+    text: str
+    slug: str  # Operation, category or language slug, or method name
+    operation: str | None = None  # Operation slug of a method
+    language: str | None = None  # Language slug of a method
+    edits: int  # Typos corrected to match the query
+
+
+class ChangeKind(str, Enum):
+    SNIPPET = "snippet"
+    OPERATION = "operation"
+    LANGUAGE = "language"
+
+
+class ChangeAction(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+class ChangedSnippet(BaseModel):
+    """Snippet as stored; code and explanation are at /api/blobs/{content_hash}."""
+    id: int
+    language_id: int
+    operation_id: int
+    method: str
+    method_title: str | None = None
+    content_hash: str
+    validation_status: ValidationStatus | None = None
+    validation_message: str | None = None
+
+
+class Change(BaseModel):
+    seq: int
+    generation: int
+    kind: ChangeKind
+    action: ChangeAction
+    operation: str | None = None  # Operation slug
+    language: str | None = None  # Language slug
+    method: str | None = None
+    content_hash: str | None = None
+    # Current state of an upserted item; None for deletes, or if deleted by a later change
+    item: ChangedSnippet | Operation | Language | None = None
+
+
+class ChangeFeed(BaseModel):
+    since: int
+    next: int  # Pass as since to continue
+    latest: int  # Highest seq in the log
+    more: bool  # Whether changes after next are already available
+    changes: list[Change]
@@ -0,0 +1,280 @@
+"""
+Fast JSON encoding for read endpoints.
+
+Routes declare a response_model from app/schemas.py for the OpenAPI schema,
+but FastAPI would also validate every ORM row through pydantic and serialize
+the result again on each request. The data comes straight from our own
+database or file catalog, so the read endpoints instead build plain dicts
+with the same fields, in the same order, and return the encoded bytes in a
+JSONBytesResponse, which FastAPI passes through untouched.
+
+orjson is used when installed, the standard json module otherwise.
+
+The encoders must be kept in step with app/schemas.py;
+bench_serialization.py checks that both paths produce the same JSON.
+"""
+
+import json
+from enum import Enum
+
+from fastapi import Response
+
+from . import changes as change_log
+from .fields import Fields
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class JSONBytesResponse(Response):
+    """Response for content that is already encoded, or plain data to encode with dumps()."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class Encoder:
+    """
+    Converts catalog objects (ORM rows or file catalog entries) to dicts
+    matching the response schemas. Languages and operations repeat across
+    rows, so each is converted once per encoder.
+    """
+
+    def __init__(self):
+        self._languages = {}
+        self._operations = {}
+        self._projections = {}
+
+    def language(self, language) -> dict:
+        encoded = self._languages.get(language.id)
+        if encoded is None:
+            encoded = {"name": language.name, "slug": language.slug, "id": language.id}
+            self._languages[language.id] = encoded
+        return encoded
+
+    def operation(self, operation) -> dict:
+        encoded = self._operations.get(operation.id)
+        if encoded is None:
+            encoded = {
+                "name": operation.name,
+                "slug": operation.slug,
+                "category": operation.category,
+                "description": operation.description,
+                "complexity": operation.complexity.value,
+                "id": operation.id,
+            }
+            self._operations[operation.id] = encoded
+        return encoded
+
+    def project(self, item, fields: Fields) -> dict:
+        """The selected fields of item (see app/fields.py)."""
+        encoded = {}
+        for name, nested in fields.items():
+            value = getattr(item, name)
+            if nested is not None:
+                cache_key = (name, nested, value.id)
+                if cache_key not in self._projections:
+                    self._projections[cache_key] = {field: plain(getattr(value, field)) for field in nested}
+                encoded[name] = self._projections[cache_key]
+            else:
+                encoded[name] = plain(value)
+        return encoded
+
+    def blob(self, blob) -> dict:
+        """schemas.Blob"""
+        return {"code": blob.source, "explanation": blob.explanation}
+
+    def changed_snippet(self, snippet) -> dict:
+        """schemas.ChangedSnippet"""
+        return {
+            "id": snippet.id,
+            "language_id": snippet.language_id,
+            "operation_id": snippet.operation_id,
+            "method": snippet.method,
+            "method_title": snippet.method_title,
+            "content_hash": snippet.content_hash,
+            "validation_status": snippet.validation_status,
+            "validation_message": snippet.validation_message,
+        }
+
+    def change(self, change, item) -> dict:
+        """schemas.Change"""
+        if item is None:
+            encoded_item = None
+        elif change.kind == change_log.SNIPPET:
+            encoded_item = self.changed_snippet(item)
+        elif change.kind == change_log.OPERATION:
+            encoded_item = self.operation(item)
+        else:
+            encoded_item = self.language(item)
+        return {
+            "seq": change.seq,
+            "generation": change.generation,
+            "kind": change.kind,
+            "action": change.action,
+            "operation": change.operation,
+            "language": change.language,
+            "method": change.method,
+            "content_hash": change.content_hash,
+            "item": encoded_item,
+        }
+
+    def related_operation(self, row: dict) -> dict:
+        return {"operation": self.operation(row["operation"]), "score": row["score"]}
+
+    def snippet(self, snippet) -> dict:
+        """schemas.Snippet"""
+        return {
+            "code": snippet.code,
+            "explanation": snippet.explanation,
+            "id": snippet.id,
+            "language_id": snippet.language_id,
+            "operation_id": snippet.operation_id,
+            "validation_status": snippet.validation_status,
+            "validation_message": snippet.validation_message,
+        }
+
+    def snippet_with_details(self, snippet) -> dict:
+        """schemas.SnippetWithDetails"""
+        return {
+            "id": snippet.id,
+            "code": snippet.code,
+            "explanation": snippet.explanation,
+            "language": self.language(snippet.language),
+            "operation": self.operation(snippet.operation),
+            "validation_status": snippet.validation_status,
+            "validation_message": snippet.validation_message,
+        }
+
+    def snippet_ref(self, snippet) -> dict:
+        """schemas.SnippetRef"""
+        return {
+            "id": snippet.id,
+            "language_id": snippet.language_id,
+            "operation_id": snippet.operation_id,
+            "content_hash": snippet.content_hash,
+            "validation_status": snippet.validation_status,
+            "validation_message": snippet.validation_message,
+        }
+
+    def snippet_with_details_ref(self, snippet) -> dict:
+        """schemas.SnippetWithDetailsRef"""
+        return {
+            "id": snippet.id,
+            "content_hash": snippet.content_hash,
+            "language": self.language(snippet.language),
+            "operation": self.operation(snippet.operation),
+            "validation_status": snippet.validation_status,
+            "validation_message": snippet.validation_message,
+        }
+
+
+def plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def encode_projection(items, fields: Fields) -> bytes:
+    encoder = Encoder()
+    return dumps([encoder.project(item, fields) for item in items])
+
+
+def encode_comparison_projection(comparison: dict, fields: Fields) -> bytes:
+    encoder = Encoder()
+    return dumps({
+        "operation": encoder.operation(comparison["operation"]),
+        "snippets": {
+            lang: encoder.project(snippet, fields) if snippet is not None else None
+            for lang, snippet in comparison["snippets"].items()
+        },
+    })
+
+
+def encode_languages(languages) -> bytes:
+    encoder = Encoder()
+    return dumps([encoder.language(language) for language in languages])
+
+
+def encode_operations(operations) -> bytes:
+    encoder = Encoder()
+    return dumps([encoder.operation(operation) for operation in operations])
+
+
+def encode_related_operations(rows: list[dict]) -> bytes:
+    encoder = Encoder()
+    return dumps([encoder.related_operation(row) for row in rows])
+
+
+def encode_snippets(snippets) -> bytes:
+    encoder = Encoder()
+    return dumps([encoder.snippet_with_details(snippet) for snippet in snippets])
+
+
+def encode_shared_snippets(snippets, blobs: dict[str, dict]) -> bytes:
+    encoder = Encoder()
+    return dumps({
+        "snippets": [encoder.snippet_with_details_ref(snippet) for snippet in snippets],
+        "blobs": blobs,
+    })
+
+
+def encode_ref_snippets(snippets) -> bytes:
+    encoder = Encoder()
+    return dumps([encoder.snippet_with_details_ref(snippet) for snippet in snippets])
+
+
+def encode_comparison(comparison: dict) -> bytes:
+    encoder = Encoder()
+    return dumps({
+        "operation": encoder.operation(comparison["operation"]),
+        "snippets": {
+            lang: encoder.snippet(snippet) if snippet is not None else None
+            for lang, snippet in comparison["snippets"].items()
+        },
+    })
+
+
+def encode_shared_comparison(comparison: dict, blobs: dict[str, dict]) -> bytes:
+    encoder = Encoder()
+    return dumps({
+        "operation": encoder.operation(comparison["operation"]),
+        "snippets": {
+            lang: encoder.snippet_ref(snippet) if snippet is not None else None
+            for lang, snippet in comparison["snippets"].items()
+        },
+        "blobs": blobs,
+    })
+
+
+def encode_ref_comparison(comparison: dict) -> bytes:
+    encoder = Encoder()
+    return dumps({
+        "operation": encoder.operation(comparison["operation"]),
+        "snippets": {
+            lang: encoder.snippet_ref(snippet) if snippet is not None else None
+            for lang, snippet in comparison["snippets"].items()
+        },
+    })
+
+
+def encode_changes(since: int, feed: dict) -> bytes:
+    encoder = Encoder()
+    changes = [encoder.change(change, item) for change, item in feed["changes"]]
+    next_seq = changes[-1]["seq"] if changes else since
+    return dumps({
+        "since": since,
+        "next": next_seq,
+        "latest": feed["latest"],
+        "more": next_seq < feed["latest"],
+        "changes": changes,
+    })
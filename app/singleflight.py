@@ -0,0 +1,70 @@
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same key at the same time, only the first
+one (the leader) runs the computation; the others wait for its result. The
+result, or the exception raised by the leader, is handed to every waiter and
+then forgotten, so nothing is cached beyond the lifetime of the flight.
+
+Callers are sync routes running in the threadpool; each flight is a
+concurrent.futures.Future they block on.
+"""
+
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised to a waiter when the leader does not finish within its timeout."""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        """Return the flight for key and whether the caller is its leader."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result=None, error: BaseException | None = None):
+        with self._lock:
+            self._flights.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._flights
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: float | None = None) -> T:
+        """
+        Run fn once for all concurrent callers with the same key (blocking).
+        Waiters give up after timeout seconds with SingleFlightTimeout.
+        """
+        future, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, result)
+            return result
+
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise SingleFlightTimeout(f"Timed out waiting for in-flight request {key!r}") from None
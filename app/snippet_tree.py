@@ -0,0 +1,123 @@
+"""
+Layout and configuration of the snippets/ tree, the source of truth for the catalog.
+
+Directory structure:
+    snippets/
+        {complexity}/
+            {operation}/
+                {language}/
+                    {method}.{ext}
+                metadata.json
+
+Shared by seed_data.py, sync_snippets.py and the file storage backend.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from .models import Complexity
+
+# Base path for snippets
+SNIPPETS_DIR = Path(__file__).resolve().parent.parent / "snippets"
+
+# Languages with their file extensions
+LANGUAGES = [
+    {"name": "Python", "slug": "python", "extension": ".py"},
+    {"name": "JavaScript", "slug": "javascript", "extension": ".js"},
+    {"name": "Java", "slug": "java", "extension": ".java"},
+]
+
+# Complexity enum to folder name mapping
+COMPLEXITY_FOLDERS = {
+    Complexity.SINGLE_FILE_SINGLE_THREAD: "single-file-single-thread",
+    Complexity.MULTIPLE_FILES_SINGLE_THREAD: "multiple-files-single-thread",
+    Complexity.ASYNCHRONOUS: "asynchronous",
+    Complexity.MULTITHREADING: "multithreading",
+}
+
+# Reverse mapping: folder name to Complexity enum
+FOLDER_TO_COMPLEXITY = {v: k for k, v in COMPLEXITY_FOLDERS.items()}
+
+# Shorthand for complexity levels
+SFST = Complexity.SINGLE_FILE_SINGLE_THREAD
+MFST = Complexity.MULTIPLE_FILES_SINGLE_THREAD
+ASYNC = Complexity.ASYNCHRONOUS
+MT = Complexity.MULTITHREADING
+
+# Operations organized by category
+OPERATIONS = [
+    # Variables - Single File Single Thread
+    {"name": "Variable Declaration", "slug": "variable-declaration", "category": "variables", "description": "Declare and initialize variables", "complexity": SFST},
+    {"name": "Constants", "slug": "constants", "category": "variables", "description": "Define constant values that cannot be reassigned", "complexity": SFST},
+    # Loops - Single File Single Thread
+    {"name": "For Loop", "slug": "for-loop", "category": "loops", "description": "Iterate a specific number of times", "complexity": SFST},
+    {"name": "While Loop", "slug": "while-loop", "category": "loops", "description": "Loop while a condition is true", "complexity": SFST},
+    {"name": "Loop with Index", "slug": "loop-with-index", "category": "loops", "description": "Iterate over a collection with access to the index", "complexity": SFST},
+    # Conditionals - Single File Single Thread
+    {"name": "If-Else", "slug": "if-else", "category": "conditionals", "description": "Conditional branching based on boolean expressions", "complexity": SFST},
+    {"name": "Switch/Match", "slug": "switch-match", "category": "conditionals", "description": "Multiple condition branching", "complexity": SFST},
+    {"name": "Ternary Operator", "slug": "ternary-operator", "category": "conditionals", "description": "Inline conditional expression", "complexity": SFST},
+    # Functions - Single File Single Thread
+    {"name": "Function Definition", "slug": "function-definition", "category": "functions", "description": "Define a reusable function", "complexity": SFST},
+    {"name": "Function with Parameters", "slug": "function-with-parameters", "category": "functions", "description": "Function that accepts arguments", "complexity": SFST},
+    {"name": "Return Values", "slug": "return-values", "category": "functions", "description": "Functions that return computed values", "complexity": SFST},
+    # Arrays - Single File Single Thread
+    {"name": "Array Declaration", "slug": "array-declaration", "category": "arrays", "description": "Create and initialize arrays/lists", "complexity": SFST},
+    {"name": "Array Iteration", "slug": "array-iteration", "category": "arrays", "description": "Loop through array elements", "complexity": SFST},
+    {"name": "Array Methods", "slug": "array-methods", "category": "arrays", "description": "Common array operations (add, remove, find)", "complexity": SFST},
+    # Strings - Single File Single Thread
+    {"name": "String Concatenation", "slug": "string-concatenation", "category": "strings", "description": "Combine multiple strings", "complexity": SFST},
+    {"name": "String Formatting", "slug": "string-formatting", "category": "strings", "description": "Insert variables into strings", "complexity": SFST},
+    {"name": "String Methods", "slug": "string-methods", "category": "strings", "description": "Common string operations", "complexity": SFST},
+    # File I/O - Multiple Files Single Thread (involves external files)
+    {"name": "Read File", "slug": "read-file", "category": "file_io", "description": "Read contents from a file", "complexity": MFST},
+    {"name": "Write File", "slug": "write-file", "category": "file_io", "description": "Write contents to a file", "complexity": MFST},
+]
+
+
+def compute_hash(code: str, explanation: str | None) -> str:
+    """Compute SHA-256 hash of snippet content."""
+    content = f"{code}|{explanation or ''}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def load_operation_metadata(op_dir: Path) -> dict:
+    """Load metadata.json for an operation directory, or {} if missing or invalid."""
+    metadata_file = op_dir / "metadata.json"
+    if metadata_file.exists():
+        try:
+            return json.loads(metadata_file.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            print(f"Warning: Invalid JSON in {metadata_file}")
+    return {}
+
+
+def scan_tree(snippets_dir: Path = SNIPPETS_DIR) -> list[tuple[str, str, str, Path, Complexity]]:
+    """
+    Scan a snippets directory for all snippet files.
+    Returns list of (operation_slug, language_slug, method, file_path, complexity) tuples.
+    """
+    snippets = []
+    if not snippets_dir.exists():
+        return snippets
+
+    for complexity_dir in sorted(snippets_dir.iterdir()):
+        complexity = FOLDER_TO_COMPLEXITY.get(complexity_dir.name)
+        if complexity is None or not complexity_dir.is_dir():
+            continue
+
+        for op_dir in sorted(complexity_dir.iterdir()):
+            if not op_dir.is_dir():
+                continue
+
+            for lang in LANGUAGES:
+                lang_dir = op_dir / lang["slug"]
+                if not lang_dir.is_dir():
+                    continue
+
+                for code_file in sorted(lang_dir.iterdir()):
+                    if code_file.is_file() and code_file.suffix == lang["extension"]:
+                        snippets.append((op_dir.name, lang["slug"], code_file.stem, code_file, complexity))
+
+    return snippets
@@ -0,0 +1,184 @@
+"""
+Staged catalog builds.
+
+seed_data and sync_snippets normally write to the live catalog, so API
+processes reading it mid-run can see an empty or half-updated catalog and
+wait on its write locks. With --staged they build into a copy instead:
+
+1. The live SQLite file is copied, with the backup API, to a new temporary
+   file next to it. The backup only holds a shared lock, so readers are
+   never blocked. Every build gets a file of its own, so builds running at
+   the same time (a watching sync and a manual seed) do not collide.
+2. The seed or sync runs against the copy, schema upgrades included.
+3. The copy is validated: SQLite integrity and foreign key checks, a
+   non-empty catalog, a blob for every snippet.
+4. The copy is renamed over the live file. The rename is atomic, and is
+   done while holding the live file's write lock after checking that the
+   live file is still the one that was copied, unmodified (same inode, same
+   SQLite file change counter). A write or swap made in the meantime is
+   never lost silently: the build fails and can be run again.
+
+API processes notice that the file was replaced (app/database.py watches
+its inode) and open new connections to it; requests already running finish
+on their connections to the old file. The new catalog has a higher
+generation whenever snippets changed, so every cache derived from the old
+one is dropped. A build that wrote nothing at all (its copy's file change
+counter did not move) is discarded without swapping; anything else it
+wrote, such as schema upgrades, validation results or a new compression
+dictionary, is swapped in with it.
+
+Only SQLite catalogs in rollback journal mode can be staged: a WAL file
+would not follow the rename.
+"""
+
+import os
+import sqlite3
+import tempfile
+from collections import Counter
+from contextlib import closing
+from typing import Callable, TypeVar
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from .database import SQLALCHEMY_DATABASE_URL, sqlite_path
+
+T = TypeVar("T")
+
+STAGING_SUFFIX = ".staging"
+
+# Seconds to wait for the live catalog's write lock before swapping
+LOCK_TIMEOUT = 30.0
+
+# (device, inode, SQLite file change counter) of a database file
+FileVersion = tuple[int, int, int]
+
+
+class StagingError(Exception):
+    """Raised when a staged catalog cannot be built, fails validation or cannot be swapped in."""
+
+
+def file_version(path: str) -> FileVersion | None:
+    """
+    Identity and change counter of a database file, None if it does not
+    exist. The counter (bytes 24-27 of the header) moves with every
+    transaction that writes to a rollback journal database.
+    """
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            header = f.read(28)
+    except FileNotFoundError:
+        return None
+    counter = int.from_bytes(header[24:28], "big") if len(header) == 28 else 0
+    return stat.st_dev, stat.st_ino, counter
+
+
+def read_generation(engine: Engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT generation FROM catalog_state WHERE id = 1")).scalar() or 0
+
+
+def copy_catalog(live: str, staging: str) -> FileVersion | None:
+    """Copy the live catalog to staging. Returns the version copied, None if there is no live catalog."""
+    if not os.path.exists(live):
+        return None
+    with closing(sqlite3.connect(f"file:{live}?mode=ro", uri=True, isolation_level=None)) as source:
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            raise StagingError(f"{live} is in WAL mode; staged builds need a rollback journal")
+        # Hold a shared lock so that the version read is the one copied
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        version = file_version(live)
+        with closing(sqlite3.connect(staging)) as target:
+            source.backup(target)
+        source.execute("COMMIT")
+    return version
+
+
+def validate_catalog(engine: Engine) -> list[str]:
+    """Problems that keep a staged catalog from being swapped in."""
+    problems = []
+    with engine.connect() as connection:
+        integrity = [row[0] for row in connection.exec_driver_sql("PRAGMA integrity_check")]
+        if integrity != ["ok"]:
+            problems += integrity
+        dangling = Counter(
+            (table, parent) for table, _, parent, _ in connection.exec_driver_sql("PRAGMA foreign_key_check")
+        )
+        for (table, parent), count in sorted(dangling.items()):
+            problems.append(f"{count} {table} rows reference missing {parent} rows")
+        for table in ("languages", "operations", "snippets"):
+            if connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() == 0:
+                problems.append(f"{table} is empty")
+        missing_blobs = connection.execute(text(
+            "SELECT COUNT(*) FROM snippets LEFT JOIN blobs ON blobs.hash = snippets.content_hash "
+            "WHERE blobs.hash IS NULL"
+        )).scalar()
+        if missing_blobs:
+            problems.append(f"{missing_blobs} snippets have no blob")
+    return problems
+
+
+def fsync_directory(path: str) -> None:
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def swap(live: str, staging: str, base: FileVersion | None) -> None:
+    """Rename staging over live, unless live is no longer the version staging was copied from."""
+    if base is None:
+        if os.path.exists(live):
+            raise StagingError(f"{live} was created while staging; run again")
+        os.replace(staging, live)
+        fsync_directory(live)
+        return
+    with closing(sqlite3.connect(live, timeout=LOCK_TIMEOUT, isolation_level=None)) as connection:
+        # Other writers wait until the rename; readers carry on
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if file_version(live) != base:
+                raise StagingError("The live catalog changed while staging; run again")
+            os.replace(staging, live)
+            fsync_directory(live)
+        finally:
+            connection.execute("ROLLBACK")
+
+
+def run_staged(build: Callable[[Engine], T], url: str = SQLALCHEMY_DATABASE_URL) -> tuple[T, int | None]:
+    """
+    Run build against a copy of the live catalog and swap the copy in if
+    build wrote to it and it validates. Returns build's result and the
+    generation swapped in, or None if build wrote nothing.
+    """
+    live = sqlite_path(url)
+    if live is None:
+        raise StagingError(f"Staged builds need a SQLite catalog file, not {url}")
+    fd, staging = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(live)), prefix=f"{os.path.basename(live)}.", suffix=STAGING_SUFFIX
+    )
+    os.close(fd)
+
+    engine = create_engine(f"sqlite:///{staging}")
+    try:
+        base = copy_catalog(live, staging)
+        copied = file_version(staging)
+        result = build(engine)
+        engine.dispose()
+        if file_version(staging) == copied:
+            return result, None
+        problems = validate_catalog(engine)
+        if problems:
+            raise StagingError("Staged catalog failed validation:\n  " + "\n  ".join(problems))
+        generation = read_generation(engine)
+        engine.dispose()
+        swap(live, staging, base)
+        return result, generation
+    finally:
+        engine.dispose()
+        for path in (staging, f"{staging}-journal"):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,230 @@
+"""
+Autocomplete index.
+
+Operation names and slugs, category names, language names and method titles
+are normalized (lowercased, punctuation folded to single spaces) and inserted
+into a prefix trie, once from the start of the text and once from the start
+of every later word, so "file" suggests "Read File". Every node keeps the ids
+of the best MAX_SUGGESTIONS entries below it in rank order, so an exact
+prefix lookup is a walk of len(q) nodes with no scan of the subtree.
+
+When exact prefixes give fewer results than asked for, the trie is searched
+again allowing a few edits (insertions, deletions, substitutions and
+transpositions of adjacent characters) between the query and a prefix of the
+text, keeping the first character and pruning every branch that is already
+over budget.
+
+The index is immutable and rebuilt when the catalog generation changes.
+"""
+
+import re
+from dataclasses import dataclass
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+OPERATION = "operation"
+CATEGORY = "category"
+LANGUAGE = "language"
+METHOD = "method"
+
+# Ties between equally good matches go to operations first, method titles last
+KIND_ORDER = {OPERATION: 0, LANGUAGE: 1, CATEGORY: 2, METHOD: 3}
+
+DEFAULT_SUGGESTIONS = 8
+MAX_SUGGESTIONS = 20
+
+# Edits allowed between a query and a prefix, by query length
+MIN_FUZZY_LENGTH = 3
+MAX_EDITS = 2
+TWO_EDITS_LENGTH = 6
+
+SEPARATOR_PATTERN = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    return SEPARATOR_PATTERN.sub(" ", text.lower()).strip()
+
+
+def allowed_edits(query: str) -> int:
+    if len(query) < MIN_FUZZY_LENGTH:
+        return 0
+    return MAX_EDITS if len(query) >= TWO_EDITS_LENGTH else 1
+
+
+@dataclass(frozen=True, slots=True)
+class Entry:
+    kind: str
+    text: str
+    slug: str
+    operation: str | None = None
+    language: str | None = None
+
+    def encode(self) -> dict:
+        return {
+            "kind": self.kind,
+            "text": self.text,
+            "slug": self.slug,
+            "operation": self.operation,
+            "language": self.language,
+        }
+
+
+class Node:
+    __slots__ = ("children", "keys", "best")
+
+    def __init__(self):
+        self.children: dict[str, Node] = {}
+        # Ranks of the keys ending here, then of the best keys in the subtree
+        self.keys: list[int] = []
+        self.best: tuple[int, ...] = ()
+
+
+class SuggestIndex:
+    """Prefix trie over catalog names, with top-k results stored per node."""
+
+    def __init__(self, entries: list[Entry]):
+        entries = list(dict.fromkeys(entries))
+
+        # One key per (entry, word the key starts at). A key's rank orders it
+        # before every worse key: matches at the start of the text first.
+        keys = set()
+        for entry_id, entry in enumerate(entries):
+            words = normalize(entry.text).split()
+            for start in range(len(words)):
+                keys.add((" ".join(words[start:]), start > 0, entry_id))
+            if entry.kind != METHOD:
+                keys.add((normalize(entry.slug), False, entry_id))
+        ranked = sorted(
+            keys,
+            key=lambda k: (k[1], KIND_ORDER[entries[k[2]].kind], len(entries[k[2]].text), entries[k[2]].text, k[0]),
+        )
+
+        self.entries = entries
+        self.encoded = [entry.encode() for entry in entries]
+        # rank -> entry id
+        self.key_entries = [entry_id for _, _, entry_id in ranked]
+        self.root = Node()
+        for rank, (text, _, _) in enumerate(ranked):
+            node = self.root
+            for char in text:
+                node = node.children.setdefault(char, Node())
+            node.keys.append(rank)
+        self._collect_best()
+
+    @classmethod
+    def build(cls, db: Session) -> "SuggestIndex":
+        entries = []
+        for op in crud.get_operations(db):
+            entries.append(Entry(OPERATION, op.name, op.slug))
+        for language in crud.get_languages(db):
+            entries.append(Entry(LANGUAGE, language.name, language.slug))
+        for category in crud.get_categories(db):
+            entries.append(Entry(CATEGORY, category["name"], category["slug"]))
+        for op_slug, lang_slug, method, title in crud.get_method_titles(db):
+            entries.append(Entry(METHOD, title, method, op_slug, lang_slug))
+        return cls(entries)
+
+    def _collect_best(self) -> None:
+        # Children before parents, without recursing once per character
+        order = [self.root]
+        for node in order:
+            order.extend(node.children.values())
+        for node in reversed(order):
+            ranks = set(node.keys)
+            for child in node.children.values():
+                ranks.update(child.best)
+            node.best = self._top(sorted(ranks), MAX_SUGGESTIONS)
+
+    def _top(self, ranks, limit: int) -> tuple[int, ...]:
+        """The first ranks of distinct entries, up to limit."""
+        top = []
+        seen = set()
+        for rank in ranks:
+            entry_id = self.key_entries[rank]
+            if entry_id not in seen:
+                seen.add(entry_id)
+                top.append(rank)
+                if len(top) == limit:
+                    break
+        return tuple(top)
+
+    def suggest(self, q: str, limit: int = DEFAULT_SUGGESTIONS) -> list[dict]:
+        """Best entries with a prefix matching q, each with the number of edits it took."""
+        query = normalize(q)
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        if not query:
+            return []
+
+        # entry id -> (edits, rank)
+        matches = {}
+        node = self.root
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            for rank in node.best[:limit]:
+                matches[self.key_entries[rank]] = (0, rank)
+
+        max_edits = allowed_edits(query)
+        if len(matches) < limit and max_edits:
+            for edits, rank in self._fuzzy(query, max_edits):
+                entry_id = self.key_entries[rank]
+                if entry_id not in matches or (edits, rank) < matches[entry_id]:
+                    matches[entry_id] = (edits, rank)
+
+        best = sorted(matches.items(), key=lambda item: item[1])[:limit]
+        return [{**self.encoded[entry_id], "edits": edits} for entry_id, (edits, _) in best]
+
+    def _fuzzy(self, query: str, max_edits: int) -> list[tuple[int, int]]:
+        """
+        (edits, rank) of the keys having a prefix within max_edits of query,
+        by optimal string alignment distance computed one trie level at a time.
+        Only the band of cells within max_edits of the diagonal can stay in
+        budget, so each level computes at most 2 * max_edits + 1 of them.
+        """
+        found = []
+        # Typos are rarely in the first character, and trusting it prunes
+        # all but one branch of the root
+        first = self.root.children.get(query[0])
+        if first is None:
+            return found
+        size = len(query) + 1
+        over = max_edits + 1
+        first_row = [i if i < over else over for i in range(size)]
+        # (node, depth, char leading to it, parent's char, row above, row above that)
+        stack = [(first, 1, query[0], "", first_row, None)]
+        while stack:
+            node, depth, char, previous_char, above, above_previous = stack.pop()
+            row = [over] * size
+            row[0] = lowest = depth if depth < over else over
+            for i in range(max(1, depth - max_edits), min(size - 1, depth + max_edits) + 1):
+                query_char = query[i - 1]
+                cost = above[i - 1] if query_char == char else above[i - 1] + 1
+                if above[i] + 1 < cost:
+                    cost = above[i] + 1
+                if row[i - 1] + 1 < cost:
+                    cost = row[i - 1] + 1
+                if (
+                    above_previous is not None and i > 1
+                    and query_char == previous_char and query[i - 2] == char
+                    and above_previous[i - 2] + 1 < cost
+                ):
+                    cost = above_previous[i - 2] + 1
+                if cost < over:
+                    row[i] = cost
+                    if cost < lowest:
+                        lowest = cost
+
+            if row[-1] <= max_edits:
+                # The whole query is matched: every key below has this prefix
+                found.extend((row[-1], rank) for rank in node.best)
+            if lowest <= max_edits:
+                # A longer prefix may still match with fewer edits
+                stack.extend(
+                    (child, depth + 1, next_char, char, row, above)
+                    for next_char, child in node.children.items()
+                )
+        return found
@@ -0,0 +1,341 @@
+"""
+Syntax validation of snippets.
+
+Every snippet is syntax-checked by the checker registered for its language:
+Python is compiled in-process, JavaScript and Java are checked with node and
+javac when they are installed (snippets in other languages, or without a
+toolchain, are reported as unchecked). Checks run in a process pool, and
+external tools are killed after a per-file timeout.
+
+Results are cached in the snippet_checks table by (content_hash, language,
+checker), where the checker id includes the toolchain version, so unchanged
+snippets are never checked twice. seed_data and sync_snippets validate
+every snippet without a status and store it on the snippet.
+
+To check a snippets tree without a database, e.g. in CI:
+
+    python -m app.validation                 # exits 1 if any snippet is invalid
+    python -m app.validation --workers 8 --timeout 20
+"""
+
+import argparse
+import ast
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from pathlib import Path
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+VALID = "valid"
+INVALID = "invalid"
+TIMEOUT = "timeout"
+UNCHECKED = "unchecked"
+
+NO_CHECKER_MESSAGE = "No checker available for this language"
+
+# Seconds an external checker may run on one file
+DEFAULT_TIMEOUT = 10.0
+
+# Below this many checks, starting a process pool costs more than it saves
+MIN_PARALLEL_CHECKS = 64
+
+
+class Checker(ABC):
+    """Syntax checker for one language. Instances are sent to worker processes."""
+
+    # Identifies the checker and toolchain version in cached results
+    id = "none"
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def check(self, code: str, timeout: float) -> tuple[str, str | None]:
+        """Returns (status, message)."""
+
+
+class PythonChecker(Checker):
+    id = f"python-{sys.version_info.major}.{sys.version_info.minor}"
+
+    def check(self, code: str, timeout: float) -> tuple[str, str | None]:
+        # Snippets for async operations may use await at the top level
+        flags = ast.PyCF_ONLY_AST | ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+        try:
+            compile(code, "<snippet>", "exec", flags=flags, dont_inherit=True)
+        except (SyntaxError, ValueError) as e:
+            line = getattr(e, "lineno", None)
+            message = getattr(e, "msg", None) or str(e)
+            return INVALID, f"line {line}: {message}" if line else message
+        except RecursionError:
+            return INVALID, "too deeply nested"
+        return VALID, None
+
+
+class CommandChecker(Checker):
+    """
+    Checks a snippet by running a command on it, written out as each of
+    several variants in turn (e.g. as a script and as a module). The snippet
+    is valid if any variant passes.
+    """
+
+    command: str = ""
+
+    @abstractmethod
+    def variants(self, code: str) -> list[tuple[str, str]]:
+        """(file name, source) for each way of reading the snippet."""
+
+    @abstractmethod
+    def args(self, path: Path, workdir: Path) -> list[str]:
+        """Command line that checks the file at path."""
+
+    def available(self) -> bool:
+        return shutil.which(self.command) is not None
+
+    def check(self, code: str, timeout: float) -> tuple[str, str | None]:
+        first_error = None
+        with tempfile.TemporaryDirectory() as tmp:
+            workdir = Path(tmp)
+            for name, source in self.variants(code):
+                path = workdir / name
+                path.write_text(source, encoding="utf-8")
+                try:
+                    result = subprocess.run(
+                        self.args(path, workdir), capture_output=True, text=True, timeout=timeout
+                    )
+                except subprocess.TimeoutExpired:
+                    return TIMEOUT, f"{self.command} did not finish in {timeout:g}s"
+                if result.returncode == 0:
+                    return VALID, None
+                if first_error is None:
+                    first_error = error_summary(result.stderr or result.stdout, tmp)
+        return INVALID, first_error
+
+
+class NodeChecker(CommandChecker):
+    command = "node"
+
+    @property
+    def id(self) -> str:
+        return f"node-{tool_version('node', '--version')}"
+
+    def variants(self, code: str) -> list[tuple[str, str]]:
+        # CommonJS first, then as an ES module for import/export and top-level await
+        return [("snippet.cjs", code), ("snippet.mjs", code)]
+
+    def args(self, path: Path, workdir: Path) -> list[str]:
+        return ["node", "--check", str(path)]
+
+
+class JavacChecker(CommandChecker):
+    """
+    Parses with javac, stopping before name resolution, so missing imports or
+    undeclared names in fragments are not reported.
+    """
+
+    command = "javac"
+
+    @property
+    def id(self) -> str:
+        return f"javac-{tool_version('javac', '-version')}"
+
+    def variants(self, code: str) -> list[tuple[str, str]]:
+        # Most snippets are statements, some declare members or whole classes
+        return [
+            ("Statements.java", f"class Statements {{ void run() throws Exception {{\n{code}\n}} }}"),
+            ("Members.java", f"class Members {{\n{code}\n}}"),
+            ("Snippet.java", code),
+        ]
+
+    def args(self, path: Path, workdir: Path) -> list[str]:
+        return [
+            "javac",
+            "-XDshould-stop.ifError=PARSE",
+            "-XDshould-stop.ifNoError=PARSE",
+            "-d", str(workdir),
+            str(path),
+        ]
+
+
+# Checkers by language slug; register checkers for other languages here
+CHECKERS: dict[str, Checker] = {
+    "python": PythonChecker(),
+    "javascript": NodeChecker(),
+    "java": JavacChecker(),
+}
+
+
+@cache
+def tool_version(*command: str) -> str:
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=DEFAULT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+    output = (result.stdout or result.stderr).strip().split()
+    return output[-1] if output else "unknown"
+
+
+def error_summary(output: str, workdir: str) -> str:
+    """Location and first error line of a tool's output, without temporary paths."""
+    lines = [line.replace(workdir + os.sep, "").strip() for line in output.splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return "syntax error"
+    error = next((line for line in lines if "error" in line.lower()), lines[0])
+    if error is not lines[0]:
+        # node prints the location on a line of its own
+        error = f"{lines[0]}: {error}"
+    return error[:500]
+
+
+@cache
+def checker_for(language: str) -> Checker | None:
+    checker = CHECKERS.get(language)
+    if checker is None or not checker.available():
+        return None
+    return checker
+
+
+def run_check(checker: Checker, code: str, timeout: float) -> tuple[str, str | None]:
+    try:
+        return checker.check(code, timeout)
+    except Exception as e:
+        return INVALID, f"checker failed: {e}"
+
+
+def check_all(
+    jobs: list[tuple[Checker, str]],
+    workers: int | None = None,
+    timeout: float = DEFAULT_TIMEOUT
+) -> list[tuple[str, str | None]]:
+    """Run (checker, code) jobs, in parallel when there are enough of them. Returns results in order."""
+    if len(jobs) < MIN_PARALLEL_CHECKS or workers == 1:
+        return [run_check(checker, code, timeout) for checker, code in jobs]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 8))
+    checkers, codes = zip(*jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_check, checkers, codes, [timeout] * len(jobs), chunksize=chunksize))
+
+
+def validate_snippets(
+    db: Session,
+    workers: int | None = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    changed: list | None = None
+) -> Counter:
+    """
+    Set the validation status of every snippet that has none (or was left
+    unchecked), reusing cached results. Does not commit. Returns the number
+    of snippets per status, plus "checked" for the checks actually run.
+    Snippets whose status or message changed are appended to changed when
+    given.
+    """
+    snippets = (
+        db.query(models.Snippet)
+        .join(models.Language)
+        .filter(or_(
+            models.Snippet.validation_status.is_(None),
+            models.Snippet.validation_status == UNCHECKED,
+        ))
+        .all()
+    )
+
+    pending: dict[tuple[str, str, str], list[models.Snippet]] = {}
+    for snippet in snippets:
+        checker = checker_for(snippet.language.slug)
+        if checker is None:
+            snippet.validation_status = UNCHECKED
+            snippet.validation_message = NO_CHECKER_MESSAGE
+            continue
+        pending.setdefault((snippet.content_hash, snippet.language.slug, checker.id), []).append(snippet)
+
+    cached = {}
+    for content_hash, language, checker_id in list(pending):
+        row = db.get(models.SnippetCheck, (content_hash, language, checker_id))
+        if row is not None:
+            cached[(content_hash, language, checker_id)] = (row.status, row.message)
+
+    keys = [key for key in pending if key not in cached]
+    results = check_all(
+        [(checker_for(language), pending[(content_hash, language, checker_id)][0].code)
+         for content_hash, language, checker_id in keys],
+        workers,
+        timeout,
+    )
+    if keys:
+        db.execute(insert(models.SnippetCheck), [
+            {"content_hash": key[0], "language": key[1], "checker": key[2], "status": status, "message": message}
+            for key, (status, message) in zip(keys, results)
+            if status != TIMEOUT  # Retried on the next run
+        ])
+
+    previous = {snippet.id: (snippet.validation_status, snippet.validation_message) for snippet in snippets}
+    counts = Counter(checked=len(keys))
+    for key, (status, message) in {**cached, **dict(zip(keys, results))}.items():
+        for snippet in pending[key]:
+            snippet.validation_status = status
+            snippet.validation_message = message
+    for snippet in snippets:
+        counts[snippet.validation_status] += 1
+        if changed is not None and (snippet.validation_status, snippet.validation_message) != previous[snippet.id]:
+            changed.append(snippet)
+    return counts
+
+
+def prune_checks(db: Session) -> int:
+    """Delete cached results for content no snippet uses any more. Returns the number deleted."""
+    result = db.execute(
+        delete(models.SnippetCheck).where(
+            models.SnippetCheck.content_hash.not_in(select(models.Snippet.content_hash).distinct())
+        )
+    )
+    return result.rowcount
+
+
+def format_counts(counts: Counter) -> str:
+    return ", ".join(f"{counts[status]} {status}" for status in (VALID, INVALID, TIMEOUT, UNCHECKED))
+
+
+def main():
+    from .snippet_tree import SNIPPETS_DIR, scan_tree
+
+    parser = argparse.ArgumentParser(description="Syntax-check every snippet in a snippets tree")
+    parser.add_argument("--snippets-dir", type=Path, default=SNIPPETS_DIR, help="Snippets directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds per file and tool")
+    args = parser.parse_args()
+
+    files = []
+    jobs = []
+    counts = Counter()
+    for op_slug, lang_slug, method, code_file, complexity in scan_tree(args.snippets_dir):
+        checker = checker_for(lang_slug)
+        if checker is None:
+            counts[UNCHECKED] += 1
+            continue
+        files.append(code_file)
+        jobs.append((checker, code_file.read_text(encoding="utf-8")))
+
+    for code_file, (status, message) in zip(files, check_all(jobs, args.workers, args.timeout)):
+        counts[status] += 1
+        if status != VALID:
+            print(f"  {status.upper()}: {code_file.relative_to(args.snippets_dir)}: {message}")
+
+    print(f"Checked {len(jobs)} snippets: {format_counts(counts)}")
+    if counts[INVALID] or counts[TIMEOUT]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
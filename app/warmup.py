@@ -0,0 +1,126 @@
+"""
+Startup warmup and readiness.
+
+After startup the app opens its pooled database connections and replays a
+list of common GET requests in-process, which executes the hot crud queries,
+pulls the SQLite pages they touch into the page cache and fills the
+application caches. /readyz only reports ready once this has succeeded, so
+traffic is not routed to a cold pod.
+
+The request list defaults to DEFAULT_WARMUP_PATHS and can be replaced with
+the WARMUP_PATHS environment variable (whitespace-separated paths).
+"""
+
+import asyncio
+import logging
+import os
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_PATHS = [
+    "/api/languages",
+    "/api/operations",
+    "/api/categories",
+    "/api/facets",
+    "/api/suggest?q=a",
+    "/api/matrix",
+    "/api/snippets?languages=python,javascript,java",
+    "/api/snippets/compare?languages=python,javascript,java&operation=for-loop",
+]
+
+# Seconds between warmup attempts while the database is unavailable
+RETRY_DELAY = 2.0
+
+
+def warmup_paths() -> list[str]:
+    value = os.getenv("WARMUP_PATHS")
+    return value.split() if value else list(DEFAULT_WARMUP_PATHS)
+
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.last_error: str | None = None
+
+
+state = WarmupState()
+
+
+def warm_connection_pool() -> int:
+    """Open every pooled connection once so requests never pay the connect cost."""
+    from .database import get_engine, uses_file_storage
+
+    if uses_file_storage():
+        return 0
+    engine = get_engine()
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connection = engine.raw_connection()
+            connection.cursor().execute("SELECT 1")
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def request(app: ASGIApp, path: str) -> int:
+    """Send a GET request through the ASGI app in-process. Returns the status code."""
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": raw_path,
+        "raw_path": raw_path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"warmup"), (b"user-agent", b"codemon-warmup")],
+        "client": ("127.0.0.1", 0),
+        "server": ("warmup", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warm_up(app: ASGIApp, paths: list[str] | None = None) -> None:
+    """Warm the pool and replay the warmup requests until they succeed, then mark ready."""
+    paths = warmup_paths() if paths is None else paths
+    while not state.ready:
+        state.attempts += 1
+        try:
+            connections = await run_in_threadpool(warm_connection_pool)
+            failures = []
+            for path in paths:
+                status = await request(app, path)
+                if status >= 500:
+                    failures.append(f"{path} -> {status}")
+            if failures:
+                raise RuntimeError("warmup requests failed: " + ", ".join(failures))
+        except Exception as e:
+            state.last_error = str(e)
+            logger.warning("Warmup attempt %d failed: %s", state.attempts, e)
+            await asyncio.sleep(RETRY_DELAY)
+            continue
+
+        state.ready = True
+        state.last_error = None
+        logger.info("Warmup complete: %d connections, %d requests", connections, len(paths))
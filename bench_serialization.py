@@ -0,0 +1,101 @@
+"""
+Serialization benchmark.
+
+Compares, for the largest read responses, the pydantic path FastAPI takes
+for a route's response_model (validate every row into the schema, dump it
+to JSON-compatible data, encode with json.dumps as JSONResponse does)
+against the encoders in app/serialization.py. Also checks that both paths
+produce the same JSON.
+
+Rows come from the snippets tree, repeated up to --rows.
+
+Usage:
+    python bench_serialization.py
+    python bench_serialization.py --rows 50000 --repeat 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from pydantic import TypeAdapter
+
+from app import schemas, serialization
+from app.blobs import shared_blobs
+from app.filestore import FileCatalog
+
+
+def starlette_render(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def pydantic_path(adapter: TypeAdapter):
+    def encode(data) -> bytes:
+        return starlette_render(adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json"))
+    return encode
+
+
+def measure(fn, data, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(data)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--rows", type=int, default=10000, help="Snippets per listing")
+    parser.add_argument("--repeat", type=int, default=7, help="Runs per measurement")
+    args = parser.parse_args()
+
+    catalog = FileCatalog.from_tree()
+    snippets = (catalog.snippets * (args.rows // len(catalog.snippets) + 1))[:args.rows]
+    comparison = catalog.get_snippets_for_comparison(["python", "javascript", "java"], "read-file")
+
+    cases = [
+        (
+            "snippets",
+            snippets,
+            pydantic_path(TypeAdapter(list[schemas.SnippetWithDetails])),
+            serialization.encode_snippets,
+        ),
+        (
+            "snippets (shared)",
+            snippets,
+            lambda rows: pydantic_path(TypeAdapter(schemas.SharedSnippetList))(
+                {"snippets": rows, "blobs": shared_blobs(rows)}
+            ),
+            lambda rows: serialization.encode_shared_snippets(rows, shared_blobs(rows)),
+        ),
+        (
+            "operations",
+            catalog.operations * (args.rows // len(catalog.operations) + 1),
+            pydantic_path(TypeAdapter(list[schemas.Operation])),
+            serialization.encode_operations,
+        ),
+        (
+            "compare",
+            comparison,
+            pydantic_path(TypeAdapter(schemas.SnippetComparison)),
+            serialization.encode_comparison,
+        ),
+    ]
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"Serialization benchmark ({args.rows} rows, median of {args.repeat}, fast path uses {encoder}):")
+    for name, data, slow, fast in cases:
+        if json.loads(slow(data)) != json.loads(fast(data)):
+            raise SystemExit(f"Output mismatch for {name}")
+        slow_time = measure(slow, data, args.repeat)
+        fast_time = measure(fast, data, args.repeat)
+        print(
+            f"  {name:<20} pydantic {slow_time * 1000:8.2f} ms   fast {fast_time * 1000:8.2f} ms"
+            f"   {slow_time / fast_time:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
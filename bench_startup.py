@@ -0,0 +1,116 @@
+"""
+Startup time benchmark.
+
+Measures, each in a fresh Python process:
+    - import time of app.main
+    - time to build the app with create_app()
+    - time from launching uvicorn to the first successful response from
+      /healthz and from a database-backed endpoint
+
+Usage:
+    python bench_startup.py                 # 5 runs against $DATABASE_URL
+    python bench_startup.py --runs 10 --path /api/languages
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+IMPORT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+app.main.create_app()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> tuple[float, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    import_time, create_time = output.split()
+    return float(import_time), float(create_time)
+
+
+def wait_for(url: str, started: float, deadline: float) -> float:
+    """Poll url until it answers 200. Returns seconds since started."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"No successful response from {url}")
+
+
+def measure_first_response(path: str, timeout: float) -> tuple[float, float, float]:
+    """Returns seconds to first /healthz, first `path` and first ready /readyz response."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:create_app", "--factory",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT
+    )
+    try:
+        deadline = started + timeout
+        base = f"http://127.0.0.1:{port}"
+        health = wait_for(f"{base}/healthz", started, deadline)
+        first = wait_for(f"{base}{path}", started, deadline)
+        ready = wait_for(f"{base}/readyz", started, deadline)
+        return health, first, ready
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(name: str, samples: list[float]):
+    print(
+        f"  {name:<24} median {statistics.median(samples) * 1000:8.1f} ms"
+        f"   min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs")
+    parser.add_argument("--path", default="/api/languages", help="Database-backed path to request")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for the server")
+    args = parser.parse_args()
+
+    results = {"import app.main": [], "create_app()": [], "first /healthz": [],
+               f"first {args.path}": [], "ready (/readyz)": []}
+    for _ in range(args.runs):
+        import_time, create_time = measure_import()
+        health, first, ready = measure_first_response(args.path, args.timeout)
+        for name, value in zip(results, (import_time, create_time, health, first, ready)):
+            results[name].append(value)
+
+    print(f"Startup benchmark ({args.runs} runs, DATABASE_URL={os.getenv('DATABASE_URL', 'default')}):")
+    for name, samples in results.items():
+        report(name, samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Query plan regression check.
+
+Builds a synthetic catalog of the requested size in a temporary SQLite
+database, runs every crud read query against it and inspects
+EXPLAIN QUERY PLAN for each SQL statement. The check fails if a query falls
+back to a full scan of a table it is expected to search through an index.
+
+Usage:
+    python check_query_plans.py                    # 2000 operations
+    python check_query_plans.py --operations 20000 --verbose
+
+Exits with status 1 if any query plan regressed, so it can run in CI.
+"""
+
+import argparse
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import catalog, crud, models
+from app.facets import rebuild_facets
+from app.fields import SNIPPET, parse_fields
+from app.related import DEFAULT_TOP_K
+from app.schema import init_schema
+
+LANGUAGES = ["python", "javascript", "java"]
+METHODS = ["basic", "advanced"]
+CATEGORIES = ["variables", "loops", "conditionals", "functions", "arrays", "strings", "file_io"]
+
+# Sparse fieldset of a navigation menu
+MENU_FIELDS = "id,method_title,language.slug,operation.slug"
+
+SCAN_PATTERN = re.compile(r"\bSCAN (?:TABLE )?(\w+)")
+
+
+def populate(session, n_operations: int) -> None:
+    """Insert a synthetic catalog with every operation implemented in every language."""
+    complexities = list(models.Complexity)
+    session.execute(insert(models.Language), [
+        {"id": i, "name": slug.title(), "slug": slug} for i, slug in enumerate(LANGUAGES, start=1)
+    ])
+    session.execute(insert(models.Operation), [
+        {
+            "id": i,
+            "name": f"Operation {i}",
+            "slug": f"operation-{i}",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "description": f"Synthetic operation {i}",
+            "complexity": complexities[i % len(complexities)],
+        }
+        for i in range(1, n_operations + 1)
+    ])
+    session.execute(insert(models.Blob), [
+        {"hash": f"{op_id}-{method}", "code": f"// operation {op_id} {method}", "explanation": None}
+        for op_id in range(1, n_operations + 1)
+        for method in METHODS
+    ])
+    session.execute(insert(models.Snippet), [
+        {
+            "language_id": lang_id,
+            "operation_id": op_id,
+            "method": method,
+            "method_title": method.title(),
+            "content_hash": f"{op_id}-{method}",
+        }
+        for op_id in range(1, n_operations + 1)
+        for lang_id in range(1, len(LANGUAGES) + 1)
+        for method in METHODS
+    ])
+    session.execute(insert(models.RelatedOperation), [
+        {"operation_id": op_id, "rank": rank, "related_operation_id": (op_id + rank) % n_operations + 1, "score": 0.5}
+        for op_id in range(1, n_operations + 1)
+        for rank in range(DEFAULT_TOP_K)
+    ])
+    rebuild_facets(session)
+    catalog.bump_generation(session)
+    session.commit()
+
+
+def checks(n_operations: int) -> list[tuple[str, callable, set[str]]]:
+    """(label, query, tables allowed to be fully scanned) for every crud read."""
+    slug = f"operation-{n_operations // 2}"
+    return [
+        ("get_languages", lambda db: crud.get_languages(db), {"languages"}),
+        ("get_language_by_slug", lambda db: crud.get_language_by_slug(db, "java"), set()),
+        ("get_operations", lambda db: crud.get_operations(db), {"operations"}),
+        ("get_operations(category)", lambda db: crud.get_operations(db, "loops"), set()),
+        (
+            "get_operations(complexity)",
+            lambda db: crud.get_operations(db, None, models.Complexity.ASYNCHRONOUS),
+            set(),
+        ),
+        ("get_operation_by_slug", lambda db: crud.get_operation_by_slug(db, slug), set()),
+        (
+            "get_related_operations",
+            lambda db: crud.get_related_operations(db, crud.get_operation_by_slug(db, slug)),
+            set(),
+        ),
+        ("get_categories", lambda db: crud.get_categories(db), set()),
+        ("get_facets", lambda db: crud.get_facets(db), {"facet_counts"}),
+        ("get_snippets", lambda db: crud.get_snippets(db, ["python", "java"]), set()),
+        ("get_snippets(operation)", lambda db: crud.get_snippets(db, ["python", "java"], slug), set()),
+        (
+            "get_snippets(fields)",
+            lambda db: crud.get_snippets(db, ["python", "java"], fields=parse_fields(MENU_FIELDS, SNIPPET)),
+            set(),
+        ),
+        (
+            "get_snippets_for_comparison",
+            lambda db: crud.get_snippets_for_comparison(db, LANGUAGES, slug),
+            set(),
+        ),
+        ("get_matrix", lambda db: crud.get_matrix(db), {"snippets", "operations", "languages"}),
+        (
+            "get_matrix(code)",
+            lambda db: crud.get_matrix(db, include_code=True),
+            {"snippets", "operations", "languages"},
+        ),
+        ("get_generation", lambda db: catalog.get_generation(db), set()),
+        ("get_changes", lambda db: crud.get_changes(db, 0, 500), set()),
+    ]
+
+
+def scanned_tables(plan: list[str]) -> set[str]:
+    tables = set()
+    for line in plan:
+        for name in SCAN_PATTERN.findall(line):
+            # SQLAlchemy aliases joined tables as <table>_<n>
+            tables.add(re.sub(r"_\d+$", "", name))
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if any crud query degrades to a full table scan")
+    parser.add_argument("--operations", type=int, default=2000, help="Synthetic catalog size")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print every query plan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'plans.db'}")
+        init_schema(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        with Session() as session:
+            populate(session, args.operations)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ANALYZE")
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not statement.startswith("EXPLAIN"):
+                statements.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", capture)
+
+        failures = 0
+        for label, query, allowed in checks(args.operations):
+            statements.clear()
+            with Session() as session:
+                query(session)
+            captured = list(statements)
+
+            with engine.connect() as connection:
+                for statement, parameters in captured:
+                    plan = [
+                        row[3]
+                        for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    ]
+                    unexpected = scanned_tables(plan) - allowed
+                    if unexpected:
+                        failures += 1
+                        print(f"  [FAIL] {label}: full scan of {', '.join(sorted(unexpected))}")
+                    else:
+                        print(f"  [  ok] {label}")
+                    if unexpected or args.verbose:
+                        for line in plan:
+                            print(f"           {line}")
+
+    if failures:
+        print(f"\n{failures} query plan(s) regressed to a full table scan.")
+        sys.exit(1)
+    print(f"\nAll query plans use indexes ({args.operations} synthetic operations).")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,146 +11,69 @@ Directory structure:
                 metadata.json
 
 Run this script to reset and seed the database: python seed_data.py
+Add --compress to store code compressed with a dictionary trained on the
+snippets (see app/compression.py), and --staged to seed a copy of the
+database and swap it in once it is complete, while the API keeps serving
+(see app/staging.py).
 
 For incremental updates, use sync_snippets.py instead.
 """
 
-import hashlib
-import json
+import argparse
 from pathlib import Path
 
-from app.database import SessionLocal, engine
-from app.models import Base, Language, Operation, Snippet, Complexity
-
-# Create all tables
-Base.metadata.create_all(bind=engine)
-
-# Base path for snippets
-SNIPPETS_DIR = Path(__file__).parent / "snippets"
-
-# Languages with their file extensions
-LANGUAGES = [
-    {"name": "Python", "slug": "python", "extension": ".py"},
-    {"name": "JavaScript", "slug": "javascript", "extension": ".js"},
-    {"name": "Java", "slug": "java", "extension": ".java"},
-]
-
-# Complexity enum to folder name mapping
-COMPLEXITY_FOLDERS = {
-    Complexity.SINGLE_FILE_SINGLE_THREAD: "single-file-single-thread",
-    Complexity.MULTIPLE_FILES_SINGLE_THREAD: "multiple-files-single-thread",
-    Complexity.ASYNCHRONOUS: "asynchronous",
-    Complexity.MULTITHREADING: "multithreading",
-}
-
-# Reverse mapping: folder name to Complexity enum
-FOLDER_TO_COMPLEXITY = {v: k for k, v in COMPLEXITY_FOLDERS.items()}
-
-# Shorthand for complexity levels
-SFST = Complexity.SINGLE_FILE_SINGLE_THREAD
-MFST = Complexity.MULTIPLE_FILES_SINGLE_THREAD
-ASYNC = Complexity.ASYNCHRONOUS
-MT = Complexity.MULTITHREADING
-
-# Operations organized by category
-OPERATIONS = [
-    # Variables - Single File Single Thread
-    {"name": "Variable Declaration", "slug": "variable-declaration", "category": "variables", "description": "Declare and initialize variables", "complexity": SFST},
-    {"name": "Constants", "slug": "constants", "category": "variables", "description": "Define constant values that cannot be reassigned", "complexity": SFST},
-    # Loops - Single File Single Thread
-    {"name": "For Loop", "slug": "for-loop", "category": "loops", "description": "Iterate a specific number of times", "complexity": SFST},
-    {"name": "While Loop", "slug": "while-loop", "category": "loops", "description": "Loop while a condition is true", "complexity": SFST},
-    {"name": "Loop with Index", "slug": "loop-with-index", "category": "loops", "description": "Iterate over a collection with access to the index", "complexity": SFST},
-    # Conditionals - Single File Single Thread
-    {"name": "If-Else", "slug": "if-else", "category": "conditionals", "description": "Conditional branching based on boolean expressions", "complexity": SFST},
-    {"name": "Switch/Match", "slug": "switch-match", "category": "conditionals", "description": "Multiple condition branching", "complexity": SFST},
-    {"name": "Ternary Operator", "slug": "ternary-operator", "category": "conditionals", "description": "Inline conditional expression", "complexity": SFST},
-    # Functions - Single File Single Thread
-    {"name": "Function Definition", "slug": "function-definition", "category": "functions", "description": "Define a reusable function", "complexity": SFST},
-    {"name": "Function with Parameters", "slug": "function-with-parameters", "category": "functions", "description": "Function that accepts arguments", "complexity": SFST},
-    {"name": "Return Values", "slug": "return-values", "category": "functions", "description": "Functions that return computed values", "complexity": SFST},
-    # Arrays - Single File Single Thread
-    {"name": "Array Declaration", "slug": "array-declaration", "category": "arrays", "description": "Create and initialize arrays/lists", "complexity": SFST},
-    {"name": "Array Iteration", "slug": "array-iteration", "category": "arrays", "description": "Loop through array elements", "complexity": SFST},
-    {"name": "Array Methods", "slug": "array-methods", "category": "arrays", "description": "Common array operations (add, remove, find)", "complexity": SFST},
-    # Strings - Single File Single Thread
-    {"name": "String Concatenation", "slug": "string-concatenation", "category": "strings", "description": "Combine multiple strings", "complexity": SFST},
-    {"name": "String Formatting", "slug": "string-formatting", "category": "strings", "description": "Insert variables into strings", "complexity": SFST},
-    {"name": "String Methods", "slug": "string-methods", "category": "strings", "description": "Common string operations", "complexity": SFST},
-    # File I/O - Multiple Files Single Thread (involves external files)
-    {"name": "Read File", "slug": "read-file", "category": "file_io", "description": "Read contents from a file", "complexity": MFST},
-    {"name": "Write File", "slug": "write-file", "category": "file_io", "description": "Write contents to a file", "complexity": MFST},
-]
-
-
-def compute_hash(code: str, explanation: str | None) -> str:
-    """Compute SHA-256 hash of snippet content."""
-    content = f"{code}|{explanation or ''}"
-    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+from sqlalchemy.engine import Engine
+
+from app import compression
+from app.blobs import ensure_blob
+from app.catalog import bump_generation
+from app.changes import ChangeSet, catalog_keys, compact, delete_missing
+from app.database import SessionLocal
+from app.facets import rebuild_facets
+from app.models import Blob, CompressionDictionary, Language, Operation, Snippet, RelatedOperation, FacetCount, Complexity
+from app.related import build_related_index
+from app.schema import init_schema
+from app.staging import StagingError, run_staged
+from app.validation import format_counts, prune_checks, validate_snippets
+from app.snippet_tree import (
+    COMPLEXITY_FOLDERS,
+    LANGUAGES,
+    OPERATIONS,
+    SNIPPETS_DIR,
+    compute_hash,
+    load_operation_metadata,
+    scan_tree,
+)
 
 
 def load_metadata(complexity_folder: str, operation_slug: str) -> dict:
     """Load metadata.json for an operation."""
-    metadata_file = SNIPPETS_DIR / complexity_folder / operation_slug / "metadata.json"
-    if metadata_file.exists():
-        try:
-            return json.loads(metadata_file.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            print(f"Warning: Invalid JSON in {metadata_file}")
-    return {}
+    return load_operation_metadata(SNIPPETS_DIR / complexity_folder / operation_slug)
 
 
 def scan_snippets() -> list[tuple[str, str, str, Path, Complexity]]:
     """
     Scan snippets directory for all snippet files.
     Returns list of (operation_slug, language_slug, method, file_path, complexity) tuples.
-
-    Structure: snippets/{complexity}/{operation}/{language}/{method}.{ext}
     """
-    snippets = []
-
-    if not SNIPPETS_DIR.exists():
-        return snippets
-
-    # Iterate through complexity folders
-    for complexity_dir in SNIPPETS_DIR.iterdir():
-        if not complexity_dir.is_dir():
-            continue
-
-        complexity_folder = complexity_dir.name
-        if complexity_folder not in FOLDER_TO_COMPLEXITY:
-            continue
-
-        complexity = FOLDER_TO_COMPLEXITY[complexity_folder]
-
-        # Iterate through operation folders
-        for op_dir in complexity_dir.iterdir():
-            if not op_dir.is_dir():
-                continue
-            operation_slug = op_dir.name
-
-            # Iterate through language folders
-            for lang in LANGUAGES:
-                lang_slug = lang["slug"]
-                extension = lang["extension"]
-                lang_dir = op_dir / lang_slug
-
-                if not lang_dir.is_dir():
-                    continue
+    return scan_tree(SNIPPETS_DIR)
 
-                for code_file in lang_dir.iterdir():
-                    if code_file.is_file() and code_file.suffix == extension:
-                        method = code_file.stem
-                        snippets.append((operation_slug, lang_slug, method, code_file, complexity))
 
-    return snippets
-
-
-def seed_database():
-    db = SessionLocal()
+def seed_database(compress: bool = False, engine: Engine | None = None):
+    """Reset and seed the database, or the one engine is connected to."""
+    init_schema(engine)
+    db = SessionLocal(bind=engine) if engine is not None else SessionLocal()
     try:
+        # Everything is logged as changed; what is not seeded again is logged as deleted
+        previous_keys = catalog_keys(db)
+        changes = ChangeSet()
+
         # Clear existing data
+        db.query(RelatedOperation).delete()
+        db.query(FacetCount).delete()
         db.query(Snippet).delete()
+        db.query(Blob).delete()
+        db.query(CompressionDictionary).delete()
         db.query(Operation).delete()
         db.query(Language).delete()
         db.commit()
@@ -162,6 +85,7 @@ def seed_database():
             db.add(lang)
             db.flush()
             languages[lang_data["slug"]] = lang
+            changes.upsert_language(lang)
 
         # Insert operations
         operations = {}
@@ -170,10 +94,12 @@ def seed_database():
             db.add(op)
             db.flush()
             operations[op_data["slug"]] = op
+            changes.upsert_operation(op)
 
         # Scan and insert snippets
         snippet_files = scan_snippets()
         snippet_count = 0
+        blob_count = 0
 
         for op_slug, lang_slug, method, code_file, complexity in snippet_files:
             # Handle new operations discovered in files
@@ -188,6 +114,7 @@ def seed_database():
                 db.add(op)
                 db.flush()
                 operations[op_slug] = op
+                changes.upsert_operation(op)
                 print(f"  + Added new operation: {op_slug} ({complexity.value})")
 
             # Read code
@@ -200,24 +127,45 @@ def seed_database():
             explanation = method_metadata.get("explanation")
             method_title = method_metadata.get("title")
 
-            # Create snippet
+            # Create snippet, storing identical content once
+            content_hash = compute_hash(code, explanation)
+            blob, created = ensure_blob(db, content_hash, code, explanation)
+            blob_count += created
             snippet = Snippet(
                 language_id=languages[lang_slug].id,
                 operation_id=operations[op_slug].id,
                 method=method,
                 method_title=method_title,
-                code=code,
-                explanation=explanation,
-                content_hash=compute_hash(code, explanation)
+                content_hash=content_hash,
+                blob=blob
             )
             db.add(snippet)
+            changes.upsert_snippet(snippet, op_slug, lang_slug)
             snippet_count += 1
 
+        # Precompute related operations and facet aggregates
+        db.flush()
+        related_count = build_related_index(db)
+        rebuild_facets(db)
+        validation_counts = validate_snippets(db)
+        prune_checks(db)
+        generation = bump_generation(db)
+        delete_missing(changes, previous_keys, catalog_keys(db))
+        changes.apply(db, generation)
+        compact(db, generation)
+        if compress:
+            dictionary, compressed_count = compression.train(db)
+
         db.commit()
         print("Database seeded successfully!")
         print(f"  - {len(languages)} languages")
         print(f"  - {len(operations)} operations")
-        print(f"  - {snippet_count} snippets")
+        print(f"  - {snippet_count} snippets ({blob_count} distinct blobs)")
+        print(f"  - {related_count} related operation links")
+        print(f"  - {validation_counts['checked']} snippets checked ({format_counts(validation_counts)})")
+        print(f"  - catalog generation {generation}")
+        if compress:
+            print(f"  - {compressed_count} blobs compressed with dictionary {dictionary.id}")
 
     except Exception as e:
         db.rollback()
@@ -227,5 +175,37 @@ def seed_database():
         db.close()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Reset and seed the database")
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Store code compressed with a dictionary trained on the snippets"
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help="Seed a copy of the database and swap it in once it is complete and valid"
+    )
+    args = parser.parse_args()
+
+    if not args.staged:
+        seed_database(compress=args.compress)
+        if args.compress:
+            compression.vacuum()
+        return
+
+    def build(engine):
+        seed_database(compress=args.compress, engine=engine)
+        if args.compress:
+            compression.vacuum(engine)
+
+    try:
+        _, generation = run_staged(build)
+    except StagingError as e:
+        raise SystemExit(f"Error: {e}")
+    print(f"Swapped in catalog generation {generation}")
+
+
 if __name__ == "__main__":
-    seed_database()
+    main()
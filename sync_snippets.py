@@ -11,80 +11,54 @@ Directory structure:
                 metadata.json
 
 Usage:
-    python sync_snippets.py          # One-time sync
-    python sync_snippets.py --watch  # Watch for changes and auto-sync
+    python sync_snippets.py             # One-time sync
+    python sync_snippets.py --watch     # Watch for changes and auto-sync
+    python sync_snippets.py --compress  # Also enable dictionary compression of code
+    python sync_snippets.py --staged    # Sync a copy of the database, then swap it in
+
+Once the database has a compression dictionary, new code is compressed with
+it; retrain with python -m app.compression train.
+
+With --staged the API never sees a half-applied sync or waits on its locks:
+the sync runs against a copy of the database, which replaces the live file
+once it is complete and valid (see app/staging.py).
 """
 
 import argparse
-import hashlib
 import json
 import sys
 import time
 from pathlib import Path
 
-from app.database import SessionLocal, engine
-from app.models import Base, Language, Operation, Snippet, Complexity
-
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
-
-# Base path for snippets
-SNIPPETS_DIR = Path(__file__).parent / "snippets"
-
-# Language configurations
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, lazyload
+
+from app import compression, snippet_tree
+from app.blobs import delete_orphan_blobs, ensure_blob
+from app.catalog import bump_generation
+from app.changes import ChangeSet, compact
+from app.database import SessionLocal
+from app.facets import FacetDelta, rebuild_facets
+from app.models import Language, Operation, Snippet, RelatedOperation, FacetCount, Complexity
+from app.related import build_related_index
+from app.schema import init_schema
+from app.staging import StagingError, run_staged
+from app.validation import format_counts, prune_checks, validate_snippets
+from app.snippet_tree import COMPLEXITY_FOLDERS, FOLDER_TO_COMPLEXITY, SNIPPETS_DIR, compute_hash
+
+# Language configurations, keyed by slug
 LANGUAGES = {
-    "python": {"name": "Python", "extension": ".py"},
-    "javascript": {"name": "JavaScript", "extension": ".js"},
-    "java": {"name": "Java", "extension": ".java"},
+    lang["slug"]: {"name": lang["name"], "extension": lang["extension"]}
+    for lang in snippet_tree.LANGUAGES
 }
 
-# Complexity enum to folder name mapping
-COMPLEXITY_FOLDERS = {
-    Complexity.SINGLE_FILE_SINGLE_THREAD: "single-file-single-thread",
-    Complexity.MULTIPLE_FILES_SINGLE_THREAD: "multiple-files-single-thread",
-    Complexity.ASYNCHRONOUS: "asynchronous",
-    Complexity.MULTITHREADING: "multithreading",
-}
-
-# Reverse mapping: folder name to Complexity enum
-FOLDER_TO_COMPLEXITY = {v: k for k, v in COMPLEXITY_FOLDERS.items()}
-
-# Shorthand for complexity levels
-SFST = Complexity.SINGLE_FILE_SINGLE_THREAD
-MFST = Complexity.MULTIPLE_FILES_SINGLE_THREAD
-ASYNC = Complexity.ASYNCHRONOUS
-MT = Complexity.MULTITHREADING
-
-# Operation configurations
+# Operation configurations, keyed by slug
 OPERATIONS = {
-    "variable-declaration": {"name": "Variable Declaration", "category": "variables", "description": "Declare and initialize variables", "complexity": SFST},
-    "constants": {"name": "Constants", "category": "variables", "description": "Define constant values that cannot be reassigned", "complexity": SFST},
-    "for-loop": {"name": "For Loop", "category": "loops", "description": "Iterate a specific number of times", "complexity": SFST},
-    "while-loop": {"name": "While Loop", "category": "loops", "description": "Loop while a condition is true", "complexity": SFST},
-    "loop-with-index": {"name": "Loop with Index", "category": "loops", "description": "Iterate over a collection with access to the index", "complexity": SFST},
-    "if-else": {"name": "If-Else", "category": "conditionals", "description": "Conditional branching based on boolean expressions", "complexity": SFST},
-    "switch-match": {"name": "Switch/Match", "category": "conditionals", "description": "Multiple condition branching", "complexity": SFST},
-    "ternary-operator": {"name": "Ternary Operator", "category": "conditionals", "description": "Inline conditional expression", "complexity": SFST},
-    "function-definition": {"name": "Function Definition", "category": "functions", "description": "Define a reusable function", "complexity": SFST},
-    "function-with-parameters": {"name": "Function with Parameters", "category": "functions", "description": "Function that accepts arguments", "complexity": SFST},
-    "return-values": {"name": "Return Values", "category": "functions", "description": "Functions that return computed values", "complexity": SFST},
-    "array-declaration": {"name": "Array Declaration", "category": "arrays", "description": "Create and initialize arrays/lists", "complexity": SFST},
-    "array-iteration": {"name": "Array Iteration", "category": "arrays", "description": "Loop through array elements", "complexity": SFST},
-    "array-methods": {"name": "Array Methods", "category": "arrays", "description": "Common array operations (add, remove, find)", "complexity": SFST},
-    "string-concatenation": {"name": "String Concatenation", "category": "strings", "description": "Combine multiple strings", "complexity": SFST},
-    "string-formatting": {"name": "String Formatting", "category": "strings", "description": "Insert variables into strings", "complexity": SFST},
-    "string-methods": {"name": "String Methods", "category": "strings", "description": "Common string operations", "complexity": SFST},
-    "read-file": {"name": "Read File", "category": "file_io", "description": "Read contents from a file", "complexity": MFST},
-    "write-file": {"name": "Write File", "category": "file_io", "description": "Write contents to a file", "complexity": MFST},
+    op["slug"]: {key: value for key, value in op.items() if key != "slug"}
+    for op in snippet_tree.OPERATIONS
 }
 
 
-def compute_hash(code: str, explanation: str | None) -> str:
-    """Compute SHA-256 hash of snippet content."""
-    content = f"{code}|{explanation or ''}"
-    return hashlib.sha256(content.encode("utf-8")).hexdigest()
-
-
 def get_operation_path(operation_slug: str, complexity: Complexity) -> Path:
     """Get the file path for an operation based on its complexity."""
     complexity_folder = COMPLEXITY_FOLDERS[complexity]
@@ -135,8 +109,16 @@ def load_snippet_from_file(
     return code, explanation, method_title, content_hash
 
 
-def ensure_languages_and_operations(db) -> tuple[dict, dict]:
-    """Ensure all languages and operations exist in the database."""
+def ensure_languages_and_operations(
+    db,
+    new_operations: list | None = None,
+    new_languages: list | None = None
+) -> tuple[dict, dict]:
+    """
+    Ensure all languages and operations exist in the database.
+    Operations and languages created here are appended to new_operations
+    and new_languages when given.
+    """
     # Ensure languages exist
     languages = {}
     for slug, config in LANGUAGES.items():
@@ -145,6 +127,8 @@ def ensure_languages_and_operations(db) -> tuple[dict, dict]:
             lang = Language(name=config["name"], slug=slug)
             db.add(lang)
             db.flush()
+            if new_languages is not None:
+                new_languages.append(lang)
             print(f"  + Added language: {config['name']}")
         languages[slug] = lang
 
@@ -162,6 +146,8 @@ def ensure_languages_and_operations(db) -> tuple[dict, dict]:
             )
             db.add(op)
             db.flush()
+            if new_operations is not None:
+                new_operations.append(op)
             print(f"  + Added operation: {config['name']}")
         operations[slug] = op
 
@@ -210,14 +196,38 @@ def scan_snippet_files() -> set[tuple[str, str, str, Complexity]]:
     return found
 
 
-def sync_snippets(db, languages: dict, operations: dict) -> dict:
-    """Sync all snippets from files to database. Returns stats."""
-    stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+def sync_snippets(
+    db,
+    languages: dict,
+    operations: dict,
+    new_operations: list | None = None,
+    changes: ChangeSet | None = None
+) -> dict:
+    """
+    Sync all snippets from files to database. Returns stats.
+
+    Facet aggregates are updated incrementally from what changed; operations
+    already created by the caller in this run should be passed as new_operations.
+    Every snippet and operation added, updated or deleted is recorded in changes
+    when given.
+    """
+    if changes is None:
+        changes = ChangeSet()
+    stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0, "blobs_written": 0}
+    facet_delta = FacetDelta()
+    for op in new_operations or []:
+        facet_delta.add_operation(op)
 
     # Get all existing snippets from database
     # Key: (operation_slug, language_slug, method)
     existing_snippets = {}
-    for snippet in db.query(Snippet).all():
+    # Change detection only needs content_hash, so the blobs are not loaded
+    query = db.query(Snippet).options(
+        joinedload(Snippet.language),
+        joinedload(Snippet.operation),
+        lazyload(Snippet.blob),
+    )
+    for snippet in query.all():
         lang_slug = snippet.language.slug
         op_slug = snippet.operation.slug
         method = snippet.method or "basic"
@@ -239,6 +249,8 @@ def sync_snippets(db, languages: dict, operations: dict) -> dict:
             )
             db.add(operations[op_slug])
             db.flush()
+            facet_delta.add_operation(operations[op_slug])
+            changes.upsert_operation(operations[op_slug])
             print(f"  + Added new operation: {op_slug} ({complexity.value})")
 
         result = load_snippet_from_file(op_slug, lang_slug, method, complexity)
@@ -252,26 +264,32 @@ def sync_snippets(db, languages: dict, operations: dict) -> dict:
             # Check if content changed
             snippet = existing_snippets[key]
             if snippet.content_hash != content_hash:
-                snippet.code = code
-                snippet.explanation = explanation
+                blob, created = ensure_blob(db, content_hash, code, explanation)
+                stats["blobs_written"] += created
+                snippet.blob = blob
                 snippet.method_title = method_title
                 snippet.content_hash = content_hash
+                snippet.validation_status = None
+                changes.upsert_snippet(snippet, op_slug, lang_slug)
                 stats["updated"] += 1
                 print(f"  ~ Updated: {op_slug}/{lang_slug}/{method}")
             else:
                 stats["unchanged"] += 1
         else:
-            # New snippet
+            # New snippet, reusing stored content when it already exists
+            blob, created = ensure_blob(db, content_hash, code, explanation)
+            stats["blobs_written"] += created
             snippet = Snippet(
                 language_id=languages[lang_slug].id,
                 operation_id=operations[op_slug].id,
                 method=method,
                 method_title=method_title,
-                code=code,
-                explanation=explanation,
-                content_hash=content_hash
+                content_hash=content_hash,
+                blob=blob
             )
             db.add(snippet)
+            facet_delta.add_snippet(operations[op_slug], languages[lang_slug])
+            changes.upsert_snippet(snippet, op_slug, lang_slug)
             stats["added"] += 1
             print(f"  + Added: {op_slug}/{lang_slug}/{method}")
 
@@ -279,20 +297,74 @@ def sync_snippets(db, languages: dict, operations: dict) -> dict:
     file_snippet_keys = {(op, lang, method) for op, lang, method, _ in file_snippets}
     for key, snippet in existing_snippets.items():
         if key not in file_snippet_keys:
+            facet_delta.add_snippet(snippet.operation, snippet.language, sign=-1)
+            changes.delete_snippet(*key)
             db.delete(snippet)
             stats["deleted"] += 1
             print(f"  - Deleted: {key[0]}/{key[1]}/{key[2]}")
 
+    # An operation counts towards a language while it has at least one snippet in it
+    pairs_before = {(op, lang): snippet.language for (op, lang, _), snippet in existing_snippets.items()}
+    pairs_after = {(op, lang) for op, lang, _ in file_snippet_keys}
+    for pair in pairs_before.keys() ^ pairs_after:
+        sign = 1 if pair in pairs_after else -1
+        language = languages.get(pair[1]) or pairs_before[pair]
+        facet_delta.add_language_operation(language, sign)
+
+    stats["blobs_deleted"] = delete_orphan_blobs(db)
+
+    db.flush()
+    if db.query(FacetCount).first() is None:
+        # First sync against a database without aggregates
+        rebuild_facets(db)
+    else:
+        facet_delta.apply(db)
+
     return stats
 
 
-def run_sync():
-    """Run a single sync operation."""
+def run_sync(compress: bool = False, engine: Engine | None = None):
+    """
+    Run a single sync operation, enabling code compression if compress is set,
+    against the database engine is connected to if given.
+    """
     print("Syncing snippets...")
-    db = SessionLocal()
+    db = SessionLocal(bind=engine) if engine is not None else SessionLocal()
     try:
-        languages, operations = ensure_languages_and_operations(db)
-        stats = sync_snippets(db, languages, operations)
+        new_operations = []
+        new_languages = []
+        languages, operations = ensure_languages_and_operations(db, new_operations, new_languages)
+        changes = ChangeSet()
+        for language in new_languages:
+            changes.upsert_language(language)
+        for op in new_operations:
+            changes.upsert_operation(op)
+        stats = sync_snippets(db, languages, operations, new_operations, changes)
+
+        content_changed = len(changes) > 0
+        db.flush()
+
+        # A snippet whose status changed (say, once a toolchain is installed)
+        # is logged like an edit, so mirrors pick up the new status
+        revalidated = []
+        validation_counts = validate_snippets(db, changed=revalidated)
+        for snippet in revalidated:
+            changes.upsert_snippet(snippet, snippet.operation.slug, snippet.language.slug)
+        prune_checks(db)
+
+        # Rebuild the related-operations index when the catalog content changed
+        if content_changed or not db.query(RelatedOperation).first():
+            related_count = build_related_index(db)
+            print(f"  Rebuilt related-operations index ({related_count} links)")
+        if changes:
+            generation = bump_generation(db)
+            changes.apply(db, generation)
+            compact(db, generation)
+            print(f"  Catalog generation is now {generation} ({len(changes)} changes logged)")
+        if compress and compression.current_dictionary(db) is None:
+            dictionary, compressed = compression.train(db)
+            print(f"  Compressed {compressed} blobs with new dictionary {dictionary.id}")
+
         db.commit()
 
         print(f"\nSync complete:")
@@ -300,6 +372,9 @@ def run_sync():
         print(f"  Updated:   {stats['updated']}")
         print(f"  Deleted:   {stats['deleted']}")
         print(f"  Unchanged: {stats['unchanged']}")
+        print(f"  Blobs:     {stats['blobs_written']} written, {stats['blobs_deleted']} removed")
+        if validation_counts['checked']:
+            print(f"  Checked:   {validation_counts['checked']} ({format_counts(validation_counts)})")
 
         return stats
     except Exception as e:
@@ -310,8 +385,23 @@ def run_sync():
         db.close()
 
 
-def watch_and_sync():
+def run_staged_sync(compress: bool = False):
+    """Run a sync against a copy of the database and swap the copy in if the catalog changed."""
+    def build(engine):
+        init_schema(engine)
+        return run_sync(compress, engine)
+
+    stats, generation = run_staged(build)
+    if generation is None:
+        print("  Nothing changed, live database left as is")
+    else:
+        print(f"  Swapped in catalog generation {generation}")
+    return stats
+
+
+def watch_and_sync(compress: bool = False, staged: bool = False):
     """Watch for file changes and sync automatically."""
+    sync = run_staged_sync if staged else run_sync
     try:
         from watchdog.observers import Observer
         from watchdog.events import FileSystemEventHandler
@@ -339,12 +429,12 @@ def watch_and_sync():
 
             self.last_sync = current_time
             print(f"\nChange detected: {path.name}")
-            run_sync()
+            sync()
 
     print(f"Watching {SNIPPETS_DIR} for changes...")
     print("Press Ctrl+C to stop.\n")
 
-    run_sync()
+    sync(compress)
 
     event_handler = SnippetChangeHandler()
     observer = Observer()
@@ -367,12 +457,30 @@ def main():
         action="store_true",
         help="Watch for file changes and auto-sync"
     )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Compress code with a trained dictionary, training one if the database has none"
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help="Sync a copy of the database and swap it in once it is complete and valid"
+    )
     args = parser.parse_args()
 
     if args.watch:
-        watch_and_sync()
+        if not args.staged:
+            init_schema()
+        watch_and_sync(args.compress, args.staged)
+    elif args.staged:
+        try:
+            run_staged_sync(args.compress)
+        except StagingError as e:
+            raise SystemExit(f"Error: {e}")
     else:
-        run_sync()
+        init_schema()
+        run_sync(args.compress)
 
 
 if __name__ == "__main__":